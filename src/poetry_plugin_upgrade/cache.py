@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from poetry_plugin_upgrade.files import atomic_write
+
+DEFAULT_TTL = 900
+DEFAULT_MAX_SIZE = 16 * 1024 * 1024
+
+
+@dataclass
+class CacheEntry:
+    """Cached metadata of a package on a package index"""
+
+    name: str
+    index_url: str
+    value: str | None
+    etag: str | None = None
+    last_modified: str | None = None
+    stored_at: float = field(default_factory=time.time)
+
+    def is_fresh(self, ttl: float) -> bool:
+        """Returns if the entry is younger than `ttl` seconds"""
+        return time.time() - self.stored_at < ttl
+
+
+class MetadataCache:
+    """Persistent, size-bounded LRU cache of package index metadata
+
+    Every entry is stored in its own JSON file named after a hash of the
+    package name and index URL. The modification time of a file is bumped
+    whenever the entry is read, so the least recently used entries are the
+    first to be evicted once the cache grows over `max_size` bytes. The size
+    of the cache is tracked between writes, the directory is only scanned
+    again once it may have grown over `max_size`.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: float = DEFAULT_TTL,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        # upper bound of the cache size, None until the directory is scanned
+        self._size: int | None = None
+
+    def _entry_path(self, name: str, index_url: str) -> Path:
+        key = hashlib.sha256(f"{index_url}\n{name}".encode()).hexdigest()
+        return self.path / f"{key}.json"
+
+    def get(self, name: str, index_url: str) -> CacheEntry | None:
+        """Returns the cached entry, fresh or not, if there is one"""
+
+        path = self._entry_path(name, index_url)
+
+        try:
+            entry = CacheEntry(**json.loads(path.read_text()))
+            os.utime(path)
+        except (OSError, TypeError, ValueError):
+            return None
+
+        return entry
+
+    def put(
+        self,
+        name: str,
+        index_url: str,
+        value: str | None,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> CacheEntry:
+        """Stores an entry and evicts least recently used entries if needed"""
+
+        entry = CacheEntry(
+            name=name,
+            index_url=index_url,
+            value=value,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        size = self._write(entry)
+
+        if self._size is not None:
+            self._size += size
+        if self._size is None or self._size > self.max_size:
+            self.evict()
+
+        return entry
+
+    def revalidate(self, entry: CacheEntry) -> CacheEntry:
+        """Marks an entry confirmed by the package index as fresh again"""
+
+        entry.stored_at = time.time()
+        self._write(entry)
+
+        return entry
+
+    def evict(self) -> None:
+        """Removes least recently used entries until under `max_size` bytes"""
+
+        entries = []
+        for path in self.path.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+
+        self._size = size
+
+    def _write(self, entry: CacheEntry) -> int:
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        content = json.dumps(asdict(entry)).encode()
+        # write atomically so concurrent runs never read a partial entry
+        atomic_write(self._entry_path(entry.name, entry.index_url), content)
+
+        return len(content)
@@ -1,17 +1,83 @@
+import fnmatch
+import os
+import re
+import time
 from collections.abc import Iterable
+from functools import partial
 from http import HTTPStatus
-from typing import Any
+from pathlib import Path
+from urllib.parse import urlparse
 
 import requests
+from cleo.formatters.formatter import Formatter
 from cleo.helpers import argument, option
+from cleo.ui.table import Table
+from packaging.utils import canonicalize_name
 from poetry.console.commands.installer_command import InstallerCommand
+from poetry.core.constraints.version import Version
 from poetry.core.packages.dependency import Dependency
 from poetry.core.packages.dependency_group import DependencyGroup
 from poetry.core.packages.package import Package
+from poetry.factory import Factory
+from poetry.poetry import Poetry
 from poetry.version.version_selector import VersionSelector
 from tomlkit import dumps
 from tomlkit.toml_document import TOMLDocument
 
+from poetry_plugin_upgrade.cache import DEFAULT_TTL, MetadataCache
+from poetry_plugin_upgrade.constraints import (
+    ConstraintKind,
+    bump_constraint,
+    classify_constraint,
+    is_bumpable_range,
+)
+from poetry_plugin_upgrade.fetcher import (
+    DEFAULT_MAX_PER_HOST,
+    LatestVersions,
+    gather_latest_versions,
+)
+from poetry_plugin_upgrade.files import ProjectSnapshot, write_document
+from poetry_plugin_upgrade.incremental import (
+    STATE_FILE,
+    IncrementalVersionSelector,
+    UpgradeState,
+)
+from poetry_plugin_upgrade.limits import SourceLimiter, apply_limits, load_limits
+from poetry_plugin_upgrade.plan import FORMATS, PlanRecord, PlanWriter, UpgradePlan
+from poetry_plugin_upgrade.prefetch import group_by_source, prefetch_pages
+from poetry_plugin_upgrade.progress import Progress
+from poetry_plugin_upgrade.resolver import (
+    ON_ERROR,
+    CachedVersionSelector,
+    CandidateLookup,
+    LookupPlan,
+    Resolution,
+    find_candidate,
+)
+from poetry_plugin_upgrade.sections import SectionIndex
+from poetry_plugin_upgrade.session import DEFAULT_RETRIES, resize_pools
+from poetry_plugin_upgrade.timings import Timings
+from poetry_plugin_upgrade.workspace import (
+    WorkspaceProject,
+    discover_projects,
+    display_path,
+    pool_signature,
+    run_updates,
+)
+
+PYPI_JSON_URL = "https://pypi.org/pypi"
+
+# kinds of constraints only bumped with --latest, in order of precedence
+SKIPPED_KINDS = (
+    ("multiple requirements", ConstraintKind.MULTIPLE),
+    ("pinned", ConstraintKind.PINNED),
+    ("wildcard", ConstraintKind.WILDCARD),
+    ("less than or equal", ConstraintKind.LESS_THAN_OR_EQUAL),
+    ("less than", ConstraintKind.LESS_THAN),
+    ("greater than", ConstraintKind.GREATER_THAN),
+    ("not equal", ConstraintKind.NOT_EQUAL),
+)
+
 
 class UpgradeCommand(InstallerCommand):
     name = "upgrade"
@@ -43,7 +109,8 @@ class UpgradeCommand(InstallerCommand):
         option(
             long_name="exclude",
             short_name=None,
-            description="Exclude dependencies.",
+            description="Exclude dependencies by name, glob pattern "
+            "(<comment>'types-*'</>) or regular expression (<comment>'re:^types-'</>).",
             multiple=True,
             flag=False,
         ),
@@ -64,87 +131,1076 @@ class UpgradeCommand(InstallerCommand):
             short_name=None,
             description="Do not bump wildcard dependencies " "when updating to latest.",
         ),
+        option(
+            long_name="jobs",
+            short_name=None,
+            description="Number of concurrent candidate lookups "
+            "(defaults to installer.max-workers).",
+            flag=False,
+        ),
+        option(
+            long_name="cache-ttl",
+            short_name=None,
+            description="Seconds for which cached versions are considered fresh.",
+            flag=False,
+            default=str(DEFAULT_TTL),
+        ),
+        option(
+            long_name="refresh",
+            short_name=None,
+            description="Ignore cached versions and look them up again.",
+        ),
+        option(
+            long_name="offline",
+            short_name=None,
+            description="Only use cached versions, never contact package indexes.",
+        ),
+        option(
+            long_name="incremental",
+            short_name=None,
+            description="Only look up dependencies whose package changed since "
+            "the last incremental run.",
+        ),
+        option(
+            long_name="prefetch",
+            short_name=None,
+            description="Fetch the index pages of all dependencies concurrently "
+            "before selecting versions.",
+        ),
+        option(
+            long_name="projects",
+            short_name=None,
+            description="Upgrade every project matching a glob pattern "
+            "(<comment>'services/*/pyproject.toml'</>) instead.",
+            multiple=True,
+            flag=False,
+        ),
+        option(
+            long_name="lock-jobs",
+            short_name=None,
+            description="Number of projects updated at once with "
+            "<comment>--projects</> (defaults to the number of CPUs).",
+            flag=False,
+        ),
+        option(
+            long_name="timings",
+            short_name=None,
+            description="Show the time spent in each phase of the upgrade.",
+        ),
+        option(
+            long_name="timings-json",
+            short_name=None,
+            description="Write the timed spans of the upgrade to a JSON file.",
+            flag=False,
+        ),
+        option(
+            long_name="format",
+            short_name=None,
+            description="Output format of the plan, <comment>text</>, "
+            "<comment>json</> or <comment>ndjson</>.",
+            flag=False,
+            default="text",
+        ),
+        option(
+            long_name="plan-out",
+            short_name=None,
+            description="Write the resolved plan to a file without changing "
+            "the project.",
+            flag=False,
+        ),
+        option(
+            long_name="apply",
+            short_name=None,
+            description="Apply a plan written with <comment>--plan-out</> "
+            "without looking up versions.",
+            flag=False,
+        ),
+        option(
+            long_name="retries",
+            short_name=None,
+            description="Number of retries of failed lookups with "
+            "<comment>--on-error retry</>.",
+            flag=False,
+            default=str(DEFAULT_RETRIES),
+        ),
+        option(
+            long_name="on-error",
+            short_name=None,
+            description="What to do when a lookup fails, <comment>abort</>, "
+            "<comment>skip</> the package or <comment>retry</> it.",
+            flag=False,
+            default="abort",
+        ),
     ]
 
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.timings = Timings()
+        # streams plan records when a machine readable format is requested
+        self.plan_writer: PlanWriter | None = None
+        # collects plan records written to the file given with --plan-out
+        self.plan_out: UpgradePlan | None = None
+        # lookups that failed with --on-error skip, reported at the end
+        self.failures: dict[CandidateLookup, Resolution] = {}
+
     def handle(self) -> int:
+        self.timings = Timings()
+        self.plan_writer = None
+        self.plan_out = None
+        self.failures = {}
+
+        try:
+            status = self.upgrade()
+            self.report_failures()
+            return status
+        finally:
+            if self.plan_writer is not None:
+                self.plan_writer.close()
+            self.report_timings()
+
+    def upgrade(self) -> int:
+        """Bumps dependencies and updates the project"""
+
         only_packages = self.argument("packages")
-        latest = self.option("latest")
+        plan = self.load_plan()
+        # plans record if their candidates were resolved with --latest
+        latest = plan.latest if plan is not None else self.option("latest")
         pinned = self.option("pinned")
         no_install = self.option("no-install")
         dry_run = self.option("dry-run")
-        exclude = self.option("exclude")
+        exclude = self.exclude_matcher()
         preserve_wildcard = self.option("preserve-wildcard")
+        jobs = (
+            self.integer_option("jobs", minimum=1)
+            if self.option("jobs") is not None
+            # match the connection pools of Poetry's repositories
+            else self.poetry.config.installer_max_workers
+        )
+        cache_ttl = self.integer_option("cache-ttl")
+        # fail on an invalid --retries before any lookup is sent
+        self.integer_option("retries")
+
+        self.check_options(latest=latest)
+        self.plan_writer = self.create_plan_writer()
+        if self.option("plan-out"):
+            self.plan_out = UpgradePlan(latest=latest)
+
+        cache = MetadataCache(
+            path=Path(self.poetry.config.get("cache-dir")) / "upgrade",
+            ttl=cache_ttl,
+        )
 
-        if pinned and not latest:
-            self.line_error("'--pinned' specified without '--latest'")
-            raise Exception
+        selector = self.create_selector(cache, jobs=jobs)
+
+        if self.option("projects"):
+            lock_jobs = (
+                self.integer_option("lock-jobs", minimum=1)
+                if self.option("lock-jobs") is not None
+                else os.cpu_count() or 1
+            )
+
+            return self.handle_workspace(
+                patterns=self.option("projects"),
+                cache=cache,
+                jobs=jobs,
+                lock_jobs=lock_jobs,
+                only_packages=only_packages,
+                latest=latest,
+                pinned=pinned,
+                exclude=exclude,
+                preserve_wildcard=preserve_wildcard,
+                plan=plan,
+            )
+
+        # parse pyproject.toml once, keep the original bytes for rollback
+        with self.timings.span("read"):
+            snapshot = ProjectSnapshot([self.poetry.file.path, self.poetry.locker.lock])
+            pyproject_content = snapshot.document(self.poetry.file.path)
+            index = SectionIndex(pyproject_content)
+
+        with self.timings.span("get_groups"):
+            dependencies = self.bumpable_dependencies(
+                groups=self.get_groups(),
+                index=index,
+                only_packages=only_packages,
+                latest=latest,
+                pinned=pinned,
+                exclude=exclude,
+                preserve_wildcard=preserve_wildcard,
+            )
+
+        bumps = self.find_bumps(
+            dependencies=dependencies,
+            latest=latest,
+            plan=plan,
+            selector=selector,
+            jobs=jobs,
+        )
 
-        if preserve_wildcard and not latest:
-            self.line_error("'--preserve-wildcard' specified without '--latest'")
+        if isinstance(selector, IncrementalVersionSelector):
+            selector.state.save()
+
+        if self.plan_out is not None:
+            self.plan_out.dump(Path(self.option("plan-out")))
+            self.info(f"Wrote plan to <comment>{self.option('plan-out')}</>")
+            return 0
+
+        # apply every bump in one pass, keeping the names of bumped dependencies
+        with self.timings.span("mutate"):
+            bumped = index.apply(bumps)
+
+        if dry_run:
+            # plan records replace the bumped pyproject.toml
+            if self.plan_writer is None:
+                self.line(dumps(pyproject_content))
+            return 0
+
+        # nothing was bumped, skip the write and the solver run
+        if not bumped:
+            self.info("Dependencies are already up to date")
+            return 0
+
+        # write new content to pyproject.toml
+        with self.timings.span("write"):
+            write_document(self.poetry.file.path, pyproject_content)
+
+        with self.timings.span("reset_poetry"):
+            self.reset_poetry()
+
+        try:
+            with self.timings.span("update"):
+                if no_install:
+                    # update lock file for bumped dependencies only
+                    self.call(name="update", args=" ".join(["--lock", *bumped]))
+                else:
+                    # update bumped dependencies only
+                    self.call(name="update", args=" ".join(bumped))
+        except Exception as e:
+            self.line(
+                "\nReverting <comment>pyproject.toml</> and <comment>poetry.lock</>"
+            )
+            snapshot.restore()
+            raise e
+
+        return 0
+
+    def handle_workspace(
+        self,
+        patterns: list[str],
+        cache: MetadataCache,
+        jobs: int,
+        lock_jobs: int,
+        only_packages: list[str],
+        latest: bool,
+        pinned: bool,
+        exclude: "ExcludeMatcher",
+        preserve_wildcard: bool,
+        plan: UpgradePlan | None = None,
+    ) -> int:
+        """Upgrades every project matching `patterns` in a single run
+
+        Projects sharing the same package sources share one version selector,
+        so a dependency declared by many projects is looked up only once. With
+        a `plan`, its candidates are applied to every project instead. At most
+        `lock_jobs` projects are updated at once, a project whose update fails
+        is reverted without affecting the others.
+        """
+
+        root = self.poetry.file.path.parent
+        try:
+            paths = discover_projects(patterns, root=root)
+        except ValueError as e:
+            self.line_error(f"Invalid '--projects': {e}")
+            raise Exception from e
+
+        if not paths:
+            self.line_error(f"No projects match '{', '.join(patterns)}'")
             raise Exception
 
-        selector = VersionSelector(self.poetry.pool)
-        pyproject_content = self.poetry.file.read()
-        original_pyproject_content = self.poetry.file.read()
+        projects = []
+        for path in paths:
+            with self.timings.span("read", project=str(path)):
+                poetry = Factory().create_poetry(path.parent, io=self.io)
+                snapshot = ProjectSnapshot([poetry.file.path, poetry.locker.lock])
+                projects.append(
+                    WorkspaceProject(
+                        poetry=poetry,
+                        content=snapshot.document(poetry.file.path),
+                        snapshot=snapshot,
+                    )
+                )
 
-        for group in self.get_groups():
-            for dependency in group.dependencies:
-                self.handle_dependency(
-                    dependency=dependency,
+        # group the lookups of all projects by the package sources they query
+        dependencies: dict[Path, list[Dependency]] = {}
+        indexes = {project.path: SectionIndex(project.content) for project in projects}
+        selectors: dict[tuple[str, ...], VersionSelector] = {}
+        shared: dict[tuple[str, ...], list[Dependency]] = {}
+
+        for project in projects:
+            with self.timings.span("get_groups", project=str(project.path)):
+                dependencies[project.path] = self.bumpable_dependencies(
+                    groups=self.workspace_groups(project.poetry),
+                    index=indexes[project.path],
+                    only_packages=only_packages,
                     latest=latest,
                     pinned=pinned,
-                    only_packages=only_packages,
-                    pyproject_content=pyproject_content,
-                    selector=selector,
                     exclude=exclude,
                     preserve_wildcard=preserve_wildcard,
                 )
 
-        if dry_run:
-            self.line(dumps(pyproject_content))
+            self.configure_sources(project.poetry, jobs=jobs)
+
+            signature = pool_signature(project.poetry.pool)
+            selectors.setdefault(
+                signature,
+                CachedVersionSelector(
+                    pool=project.poetry.pool,
+                    cache=cache,
+                    offline=self.option("offline"),
+                    refresh=self.option("refresh"),
+                ),
+            )
+            shared.setdefault(signature, []).extend(dependencies[project.path])
+
+        candidates: dict[tuple[str, ...], dict[CandidateLookup, Package | None]] = {}
+        for signature, selector in selectors.items():
+            if plan is None:
+                candidates[signature] = self.resolve_dependencies(
+                    dependencies=shared[signature],
+                    latest=latest,
+                    selector=selector,
+                    jobs=jobs,
+                )
+
+        for project in projects:
+            with self.timings.span("mutate", project=str(project.path)):
+                project.bumped = indexes[project.path].apply(
+                    self.planned_bumps(
+                        plan=plan, dependencies=dependencies[project.path]
+                    )
+                    if plan is not None
+                    else self.bumps(
+                        dependencies=dependencies[project.path],
+                        latest=latest,
+                        candidates=candidates[pool_signature(project.poetry.pool)],
+                    )
+                )
+
+        if self.option("dry-run"):
+            for project in projects:
+                self.line(f"<info>{display_path(project.path, root)}</>")
+                self.line(dumps(project.content))
             return 0
 
-        # write new content to pyproject.toml
-        self.poetry.file.write(pyproject_content)
-        self.reset_poetry()
+        updates = []
+        for project in projects:
+            if not project.bumped:
+                self.line(
+                    f"Dependencies of <comment>{display_path(project.path, root)}</> "
+                    "are already up to date"
+                )
+                continue
+
+            with self.timings.span("write", project=str(project.path)):
+                write_document(project.path, project.content)
+            updates.append(project)
+
+        if not updates:
+            return 0
+
+        return self.update_projects(updates, root=root, lock_jobs=lock_jobs)
+
+    def update_projects(
+        self, projects: list[WorkspaceProject], root: Path, lock_jobs: int
+    ) -> int:
+        """Updates bumped workspace projects, reverting those that fail"""
+
+        with self.timings.span("update"):
+            results = run_updates(
+                projects, no_install=self.option("no-install"), jobs=lock_jobs
+            )
+
+        # revert the projects whose update failed before reporting, keep the others
+        for result in results:
+            if result.failed:
+                result.project.snapshot.restore()
+
+        for result in results:
+            self.line(f"\n<info>Updating {display_path(result.project.path, root)}</>")
+            self.line(result.output.rstrip())
+
+            if result.failed:
+                self.line(
+                    "\nReverted <comment>pyproject.toml</> and "
+                    "<comment>poetry.lock</>"
+                )
+
+        failed = [result for result in results if result.failed]
+        self.line(
+            f"\nUpdated {len(results) - len(failed)} projects, {len(failed)} failed"
+        )
+        for result in failed:
+            self.line_error(
+                f"Updating <comment>{display_path(result.project.path, root)}</> "
+                "failed"
+            )
+
+        return 1 if failed else 0
+
+    def exclude_matcher(self) -> "ExcludeMatcher":
+        """Returns the matcher of the names given with --exclude"""
 
         try:
-            if no_install:
-                # update lock file
-                self.call(name="lock", args="--no-update")
-            else:
-                # update dependencies
-                self.call(name="update")
-        except Exception as e:
-            self.line("\nReverting <comment>pyproject.toml</>")
-            self.poetry.file.write(original_pyproject_content)
-            raise e
+            return ExcludeMatcher(self.option("exclude"))
+        except ValueError as e:
+            self.line_error(f"Invalid '--exclude': {e}")
+            raise Exception from e
 
-        return 0
+    def check_options(self, latest: bool) -> None:
+        """Fails on options that cannot be combined"""
+
+        if self.option("pinned") and not latest:
+            self.line_error("'--pinned' specified without '--latest'")
+            raise Exception
+
+        if self.option("preserve-wildcard") and not latest:
+            self.line_error("'--preserve-wildcard' specified without '--latest'")
+            raise Exception
+
+        if self.option("refresh") and self.option("offline"):
+            self.line_error("'--refresh' specified with '--offline'")
+            raise Exception
+
+        if self.option("on-error") not in ON_ERROR:
+            self.line_error(
+                f"Invalid on-error '{self.option('on-error')}', "
+                f"expected one of {', '.join(ON_ERROR)}"
+            )
+            raise Exception
+
+    def create_selector(self, cache: MetadataCache, jobs: int) -> CachedVersionSelector:
+        """Returns the version selector of the project
+
+        With `--incremental`, the state of the previous run is read from the
+        state file next to pyproject.toml.
+        """
+
+        limiters = self.configure_sources(self.poetry, jobs=jobs)
+
+        if not self.option("incremental"):
+            return CachedVersionSelector(
+                pool=self.poetry.pool,
+                cache=cache,
+                offline=self.option("offline"),
+                refresh=self.option("refresh"),
+            )
+
+        for name in ("offline", "projects", "apply", "prefetch"):
+            if self.option(name):
+                self.line_error(f"'--incremental' specified with '--{name}'")
+                raise Exception
+
+        return IncrementalVersionSelector(
+            pool=self.poetry.pool,
+            cache=cache,
+            state=UpgradeState(self.poetry.file.path.parent / STATE_FILE),
+            refresh=self.option("refresh"),
+            limiters=limiters,
+        )
+
+    def configure_sources(self, poetry: Poetry, jobs: int) -> dict[str, SourceLimiter]:
+        """Prepares the package sources of a project for concurrent lookups
+
+        Connection pools are sized to `jobs`, then the per-source limits
+        configured in pyproject.toml are installed. Returns the limiter of
+        each limited repository of the project.
+        """
+
+        resize_pools(poetry.pool, pool_size=jobs)
+
+        try:
+            limits = load_limits(poetry.pyproject.data)
+        except ValueError as e:
+            self.line_error(f"Invalid source limits: {e}")
+            raise Exception from e
+
+        names = {repository.name.lower() for repository in poetry.pool.all_repositories}
+        for name in sorted(set(limits) - names):
+            self.line_error(f"<warning>Limits of unknown source '{name}' ignored</>")
+
+        return apply_limits(poetry.pool, limits)
+
+    def load_plan(self) -> UpgradePlan | None:
+        """Validates the plan options, returns the plan to apply if any"""
+
+        path = self.option("apply")
+
+        if self.option("plan-out") and self.option("projects"):
+            self.line_error("'--plan-out' specified with '--projects'")
+            raise Exception
+
+        if path is None:
+            return None
+
+        if self.option("plan-out"):
+            self.line_error("'--apply' specified with '--plan-out'")
+            raise Exception
+
+        if self.option("latest"):
+            self.line_error("'--latest' specified with '--apply'")
+            raise Exception
+
+        try:
+            return UpgradePlan.load(Path(path))
+        except (OSError, ValueError) as e:
+            self.line_error(f"Cannot read plan '{path}': {e}")
+            raise Exception from e
+
+    def create_plan_writer(self) -> PlanWriter | None:
+        """Returns the writer of plan records for the requested format"""
+
+        output_format = self.option("format")
+
+        if output_format not in FORMATS:
+            self.line_error(f"'--format' must be one of {', '.join(FORMATS)}")
+            raise Exception
+
+        if output_format == "text":
+            return None
+
+        if self.option("projects"):
+            self.line_error("'--format' specified with '--projects'")
+            raise Exception
+
+        if self.option("apply"):
+            self.line_error("'--format' specified with '--apply'")
+            raise Exception
+
+        # the output of the delegated update would corrupt the records
+        if not self.option("dry-run") and not self.option("plan-out"):
+            self.line_error("'--format' specified without '--dry-run' or '--plan-out'")
+            raise Exception
+
+        return PlanWriter(self.io, output_format)
+
+    def report_failures(self) -> None:
+        """Reports the packages skipped because their lookup failed"""
+
+        if not self.failures:
+            return
+
+        self.line_error(
+            f"\n<warning>Skipped {len(self.failures)} packages whose lookup "
+            "failed:</>"
+        )
+        for resolution in sorted(
+            self.failures.values(),
+            key=lambda resolution: resolution.lookup.package_name,
+        ):
+            error = Formatter.escape(str(resolution.error) or repr(resolution.error))
+            self.line_error(f"  - <c1>{resolution.lookup.package_name}</>: {error}")
+
+    def report_timings(self) -> None:
+        """Reports the time spent in each phase when requested"""
+
+        if self.option("timings"):
+            # keep the table out of the plan records written to the output
+            table = Table(
+                self.io.error_output if self.plan_writer is not None else self.io
+            )
+            table.set_headers(["Phase", "Calls", "Total (s)", "Max (s)"])
+            table.set_rows(
+                [
+                    [
+                        phase.name,
+                        str(phase.calls),
+                        f"{phase.total:.3f}",
+                        f"{phase.max:.3f}",
+                    ]
+                    for phase in self.timings.summary()
+                ]
+            )
+            self.info("")
+            table.render()
+
+        if self.option("timings-json"):
+            self.timings.dump(Path(self.option("timings-json")))
+
+    def integer_option(self, name: str, minimum: int = 0) -> int:
+        """Returns the value of an integer option"""
+
+        value = self.option(name)
+
+        if value is None or not value.isdigit() or int(value) < minimum:
+            kind = "a positive" if minimum else "a non-negative"
+            self.line_error(f"'--{name}' must be {kind} integer")
+            raise Exception
+
+        return int(value)
 
     def get_groups(self) -> Iterable[DependencyGroup]:
-        """Returns activated dependency groups"""
+        """Returns activated dependency groups in declaration order"""
+
+        activated_groups = self.activated_groups
 
-        for group in self.activated_groups:
-            yield self.poetry.package.dependency_group(group)
+        for group in self.poetry.package._dependency_groups.values():  # noqa: SLF001
+            if group.name in activated_groups:
+                yield group
+
+    def workspace_groups(self, poetry: Poetry) -> list[DependencyGroup]:
+        """Returns activated dependency groups of a workspace project
+
+        Unlike `get_groups`, groups selected with `--with`, `--without` or
+        `--only` which a project does not declare are ignored.
+        """
+
+        options = {
+            key: {
+                canonicalize_name(group.strip())
+                for groups in self.option(key, "")
+                for group in groups.split(",")
+            }
+            for key in ("with", "without", "only")
+        }
+        groups = list(poetry.package._dependency_groups.values())  # noqa: SLF001
+
+        if self.option("all-groups"):
+            return groups
+
+        if options["only"]:
+            return [group for group in groups if group.name in options["only"]]
+
+        return [
+            group
+            for group in groups
+            if (not group.is_optional() or group.name in options["with"])
+            and group.name not in options["without"]
+        ]
+
+    def bumpable_dependencies(
+        self,
+        groups: Iterable[DependencyGroup],
+        index: SectionIndex,
+        only_packages: list[str],
+        latest: bool,
+        pinned: bool,
+        exclude: "ExcludeMatcher",
+        preserve_wildcard: bool,
+    ) -> list[Dependency]:
+        """Returns the bumpable dependencies of `groups` in declaration order
+
+        Dependencies declared by PEP 621 requirements take the requirement's
+        own specifier as constraint. Skipped dependencies are written to the
+        plan right away.
+        """
+
+        dependencies = []
+
+        for group in groups:
+            for declared in group.dependencies:
+                dependency, skip_reason = self.declared_dependency(declared, index)
+                skip_reason = skip_reason or self.skip_reason(
+                    dependency,
+                    only_packages,
+                    latest,
+                    pinned,
+                    exclude,
+                    preserve_wildcard,
+                )
+
+                if skip_reason is None:
+                    dependencies.append(dependency)
+                elif self.recording:
+                    self.record(
+                        PlanRecord(
+                            group=group.name,
+                            name=dependency.name,
+                            old_constraint=dependency.pretty_constraint,
+                            skip_reason=skip_reason,
+                        )
+                    )
+
+        return dependencies
+
+    @staticmethod
+    def declared_dependency(
+        dependency: Dependency, index: SectionIndex
+    ) -> tuple[Dependency, str | None]:
+        """Returns `dependency` with its declared constraint and a skip reason
+
+        Requirements without a version specifier have nothing to bump.
+        """
+
+        constraint = index.declared_constraint(dependency)
+
+        if constraint is None:
+            return dependency, None
+
+        if not constraint:
+            return dependency, "unconstrained"
+
+        return dependency.with_constraint(constraint), None
+
+    def bumps(
+        self,
+        dependencies: Iterable[Dependency],
+        latest: bool,
+        candidates: dict[CandidateLookup, Package | None],
+    ) -> list[tuple[Dependency, str]]:
+        """Returns the new constraint of every dependency that changes"""
+
+        bumps = []
+        for dependency in dependencies:
+            lookup = self.candidate_lookup(dependency=dependency, latest=latest)
+            if lookup in self.failures:
+                continue
+
+            new_version = self.bumped_constraint(
+                dependency=dependency, candidate=candidates[lookup]
+            )
+            if new_version is not None:
+                bumps.append((dependency, new_version))
+
+        return bumps
+
+    def find_bumps(
+        self,
+        dependencies: list[Dependency],
+        latest: bool,
+        plan: UpgradePlan | None,
+        selector: VersionSelector,
+        jobs: int,
+    ) -> list[tuple[Dependency, str]]:
+        """Returns the bumps of `dependencies`, taken from `plan` if given"""
+
+        if plan is not None:
+            # planned candidates replace lookups
+            return self.planned_bumps(plan=plan, dependencies=dependencies)
+
+        # look up each distinct candidate concurrently, then apply them in order
+        candidates = self.resolve_dependencies(
+            dependencies=dependencies, latest=latest, selector=selector, jobs=jobs
+        )
+
+        return self.bumps(
+            dependencies=dependencies, latest=latest, candidates=candidates
+        )
+
+    def planned_bumps(
+        self, plan: UpgradePlan, dependencies: Iterable[Dependency]
+    ) -> list[tuple[Dependency, str]]:
+        """Returns the new constraint of every dependency bumped by `plan`
+
+        Dependencies are matched to planned candidates by group and name. Unless
+        the plan was resolved with `--latest`, candidates not allowed by the
+        constraint of the dependency are skipped.
+        """
+
+        planned = plan.candidates()
+        bumps = []
+
+        for dependency in dependencies:
+            candidate = next(
+                (
+                    planned[(group, dependency.name)]
+                    for group in sorted(dependency.groups)
+                    if (group, dependency.name) in planned
+                ),
+                None,
+            )
+
+            if candidate is None:
+                self.info(f"No planned version for '{dependency.name}'")
+                continue
+
+            if not plan.latest and not dependency.constraint.allows(
+                Version.parse(candidate)
+            ):
+                self.line_error(
+                    f"<warning>Skipping '{dependency.name}', {candidate} is not "
+                    f"allowed by {dependency.pretty_constraint}</>"
+                )
+                continue
+
+            new_version = self.bumped_constraint(
+                dependency=dependency,
+                candidate=Package(name=dependency.name, version=candidate),
+            )
+            if new_version is not None:
+                bumps.append((dependency, new_version))
+
+        return bumps
+
+    def resolve_dependencies(
+        self,
+        dependencies: list[Dependency],
+        latest: bool,
+        selector: VersionSelector,
+        jobs: int,
+    ) -> dict[CandidateLookup, Package | None]:
+        """Resolves the candidates of `dependencies`, streaming progress
+
+        Dependencies sharing a lookup are resolved once, the outcome of every
+        lookup is reported as soon as it completes.
+        """
+
+        shared: dict[CandidateLookup, list[Dependency]] = {}
+        for dependency in dependencies:
+            lookup = self.candidate_lookup(dependency=dependency, latest=latest)
+            shared.setdefault(lookup, []).append(dependency)
+
+        plan = LookupPlan(
+            self.candidate_lookup(dependency=dependency, latest=latest)
+            for dependency in dependencies
+        )
+        if self.option("prefetch") and isinstance(selector, CachedVersionSelector):
+            self.prefetch(selector=selector, lookups=plan.lookups, jobs=jobs)
+
+        progress = Progress(self.io, total=len(plan.lookups))
+
+        def resolved(resolution: Resolution) -> None:
+            if resolution.error is not None and self.option("on-error") == "skip":
+                self.failures[resolution.lookup] = resolution
+
+            if self.recording:
+                for dependency in shared[resolution.lookup]:
+                    self.record(self.plan_record(dependency, resolution))
+
+            progress.advance(
+                [
+                    self.describe_resolution(dependency, resolution)
+                    for dependency in shared[resolution.lookup]
+                ],
+                failed=resolution.error is not None,
+            )
+
+        try:
+            candidates = plan.resolve(
+                selector=selector,
+                jobs=jobs,
+                timings=self.timings,
+                on_resolved=resolved,
+                on_error=self.option("on-error"),
+                retries=self.integer_option("retries"),
+            )
+        finally:
+            progress.finish()
+
+        if plan.saved:
+            self.info(
+                f"Resolved {len(plan.lookups)} packages, "
+                f"skipped {plan.saved} duplicate lookups"
+            )
+
+        return candidates
+
+    @property
+    def recording(self) -> bool:
+        """Returns if plan records are streamed or written to a plan file"""
+
+        return self.plan_writer is not None or self.plan_out is not None
+
+    def record(self, record: PlanRecord) -> None:
+        """Streams a plan record and adds it to the plan file"""
+
+        if self.plan_writer is not None:
+            self.plan_writer.write(record)
+
+        if self.plan_out is not None:
+            self.plan_out.records.append(record)
+
+    def prefetch(
+        self,
+        selector: CachedVersionSelector,
+        lookups: list[CandidateLookup],
+        jobs: int,
+    ) -> None:
+        """Warms the repository caches with the index pages of `lookups`"""
+
+        sources = group_by_source(selector, lookups)
+        if not sources:
+            return
+
+        start = time.perf_counter()
+        prefetch_pages(sources, jobs=jobs, timings=self.timings)
+
+        pages = sum(len(source.names) for source in sources)
+        failed = sum(len(source.failed) for source in sources)
+        self.info(
+            f"Prefetched {pages - failed} index pages from {len(sources)} sources "
+            f"in {time.perf_counter() - start:.2f} s"
+            + (f", {failed} failed" if failed else "")
+        )
+
+    def plan_record(self, dependency: Dependency, resolution: Resolution) -> PlanRecord:
+        """Returns the plan record of a resolved dependency"""
+
+        record = PlanRecord(
+            group=",".join(sorted(dependency.groups)),
+            name=dependency.name,
+            old_constraint=dependency.pretty_constraint,
+        )
+
+        if resolution.error is not None:
+            record.skip_reason = "lookup failed"
+        elif resolution.candidate is None:
+            record.skip_reason = "no candidate"
+        else:
+            record.candidate = resolution.candidate.pretty_version
+            new_version = self.handle_version(
+                current_version=dependency.pretty_constraint,
+                candidate=resolution.candidate,
+            )
+            if new_version == dependency.pretty_constraint:
+                record.skip_reason = "up to date"
+            else:
+                record.new_constraint = new_version
+
+        return record
+
+    def info(self, message: str) -> None:
+        """Writes an informational message
+
+        Messages go to the error output when plan records are written to the
+        output, so the records can be parsed.
+        """
+
+        if self.plan_writer is not None:
+            self.line_error(message)
+        else:
+            self.line(message)
+
+    def describe_resolution(
+        self, dependency: Dependency, resolution: Resolution
+    ) -> str:
+        """Returns the progress event of a dependency"""
+
+        arrow = "→" if self.io.error_output.supports_utf8() else "->"
+        details = f"{resolution.seconds * 1000:.0f} ms"
+        if resolution.cached is not None:
+            details += ", cache hit" if resolution.cached else ", cache miss"
+        if resolution.attempts > 1:
+            details += f", {resolution.attempts} attempts"
+
+        name = f"<c1>{dependency.name}</>"
+        constraint = dependency.pretty_constraint
+
+        if resolution.error is not None:
+            error = Formatter.escape(str(resolution.error) or repr(resolution.error))
+            return f"{name}: <error>failed</> ({error})"
+
+        if resolution.candidate is None:
+            return f"{name}: {constraint} {arrow} <comment>no candidate</> ({details})"
+
+        new_version = self.handle_version(
+            current_version=constraint, candidate=resolution.candidate
+        )
+
+        if new_version == constraint:
+            return f"{name}: {constraint} (up to date, {details})"
+
+        return f"{name}: {constraint} {arrow} <info>{new_version}</> ({details})"
 
     @staticmethod
-    def retrieve_latest_version(name: str) -> str | None:
-        """Retrieve the latest version of a package from PyPI"""
+    def retrieve_latest_version(
+        name: str,
+        session: requests.Session | None = None,
+        cache: MetadataCache | None = None,
+        offline: bool = False,
+        refresh: bool = False,
+        index_url: str = PYPI_JSON_URL,
+        timeout: float = 10,
+    ) -> str | None:
+        """Retrieve the latest version of a package from PyPI
+
+        Requests go through the pooled `session` when given and give up after
+        `timeout` seconds. Versions are kept in `cache` when given. Stale
+        entries are revalidated with their ETag and Last-Modified headers
+        instead of being downloaded again.
+        """
+
+        entry = None
+        if cache is not None:
+            entry = cache.get(name, index_url)
 
-        response: requests.Response = requests.get(
-            f"https://pypi.org/pypi/{name}/json", timeout=10
+            if entry is not None and (
+                offline or (not refresh and entry.is_fresh(cache.ttl))
+            ):
+                return entry.value
+
+        if offline:
+            return None
+
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        get = session.get if session is not None else requests.get
+        response: requests.Response = get(
+            f"{index_url}/{name}/json", headers=headers, timeout=timeout
         )
 
+        if (
+            cache is not None
+            and entry is not None
+            and response.status_code == HTTPStatus.NOT_MODIFIED
+        ):
+            return cache.revalidate(entry).value
+
         if response.status_code not in (HTTPStatus.OK, HTTPStatus.NOT_FOUND):
             response.raise_for_status()
 
-        if response.status_code == HTTPStatus.NOT_FOUND:
-            return None
+        version: str | None = None
+        if response.status_code == HTTPStatus.OK:
+            version = response.json().get("info")["version"]
+
+        if cache is not None:
+            cache.put(
+                name,
+                index_url,
+                version,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
 
-        info = response.json().get("info")
+        return version
 
-        return info["version"]
+    @staticmethod
+    async def retrieve_latest_versions(
+        names: Iterable[str],
+        session: requests.Session | None = None,
+        cache: MetadataCache | None = None,
+        offline: bool = False,
+        refresh: bool = False,
+        index_url: str = PYPI_JSON_URL,
+        max_per_host: int = DEFAULT_MAX_PER_HOST,
+        deadline: float | None = None,
+    ) -> LatestVersions:
+        """Retrieve the latest versions of many packages from PyPI concurrently
+
+        Returns the version of every package that was looked up, failed
+        lookups and lookups cut off by `deadline` are reported separately.
+        """
+
+        host = urlparse(index_url).netloc
+
+        return await gather_latest_versions(
+            names=names,
+            fetch=partial(
+                UpgradeCommand.retrieve_latest_version,
+                session=session,
+                cache=cache,
+                offline=offline,
+                refresh=refresh,
+                index_url=index_url,
+            ),
+            host=lambda _: host,
+            max_per_host=max_per_host,
+            deadline=deadline,
+        )
 
     def handle_dependency(
         self,
@@ -154,7 +1210,7 @@ class UpgradeCommand(InstallerCommand):
         only_packages: list[str],
         pyproject_content: TOMLDocument,
         selector: VersionSelector,
-        exclude: list[str],
+        exclude: "Iterable[str] | ExcludeMatcher",
         preserve_wildcard: bool,
     ) -> None:
         """Handle dependency update based on options
@@ -173,57 +1229,80 @@ class UpgradeCommand(InstallerCommand):
         ):
             return
 
-        target_package_version = "*" if latest else dependency.pretty_constraint
-        candidate: Package | None = selector.find_best_candidate(
-            package_name=dependency.name,
-            target_package_version=target_package_version,
-            allow_prereleases=dependency.allows_prereleases(),
-            source=dependency.source_name,
+        candidate = find_candidate(
+            selector=selector,
+            lookup=self.candidate_lookup(dependency=dependency, latest=latest),
         )
 
+        # runs resolving many dependencies report them through their progress
         if candidate is None:
-            self.line(f"No new version for '{dependency.name}'")
+            self.info(f"No new version for '{dependency.name}'")
             return
 
-        new_version = self.handle_version(
-            current_version=dependency.pretty_constraint, candidate=candidate
+        self.apply_candidate(
+            dependency=dependency,
+            candidate=candidate,
+            pyproject_content=pyproject_content,
+        )
+
+    @staticmethod
+    def candidate_lookup(dependency: Dependency, latest: bool) -> CandidateLookup:
+        """Returns the candidate lookup of a bumpable dependency"""
+
+        return CandidateLookup(
+            package_name=dependency.name,
+            target_package_version="*" if latest else dependency.pretty_constraint,
+            allow_prereleases=dependency.allows_prereleases(),
+            source=dependency.source_name,
         )
 
-        self.bump_version_in_pyproject_content(
+    def apply_candidate(
+        self,
+        dependency: Dependency,
+        candidate: Package | None,
+        pyproject_content: TOMLDocument,
+    ) -> bool:
+        """Bumps `dependency` in pyproject content to the resolved candidate
+
+        Returns if the constraint of the dependency changed.
+        """
+
+        new_version = self.bumped_constraint(dependency=dependency, candidate=candidate)
+
+        if new_version is None:
+            return False
+
+        return self.bump_version_in_pyproject_content(
             dependency=dependency,
             new_version=new_version,
             pyproject_content=pyproject_content,
         )
 
-    @staticmethod
-    def handle_version(current_version: str, candidate: Package) -> str:
-        """Handle version based on original version"""
+    def bumped_constraint(
+        self, dependency: Dependency, candidate: Package | None
+    ) -> str | None:
+        """Returns the new constraint of `dependency`, if it changes"""
 
-        if current_version[0] == "<":
-            return current_version
+        if candidate is None:
+            return None
 
-        version_constraint: str | None = None
+        new_version = self.handle_version(
+            current_version=dependency.pretty_constraint, candidate=candidate
+        )
 
-        # preserve zero based carets ('^0.0') when bumping to latest
-        if current_version[0] == "^":
-            version_constraint = "^"
+        if new_version == dependency.pretty_constraint:
+            return None
 
-        if current_version[0] == "~" and "." in current_version:
-            version_constraint = "~"
+        return new_version
 
-        if current_version.startswith(">="):
-            version_constraint = ">="
-        elif current_version[0] == ">":
-            version_constraint = ">"
+    @staticmethod
+    def handle_version(current_version: str, candidate: Package) -> str:
+        """Handle version based on original version
 
-        if current_version.startswith("=="):
-            version_constraint = "=="
+        Rewrites the constraint keeping its operators and precision.
+        """
 
-        return (
-            f"{version_constraint}{candidate.pretty_version}"
-            if version_constraint
-            else candidate.pretty_version
-        )
+        return bump_constraint(current_version, candidate.pretty_version)
 
     @staticmethod
     def is_bumpable(
@@ -231,111 +1310,168 @@ class UpgradeCommand(InstallerCommand):
         only_packages: list[str],
         latest: bool,
         pinned: bool,
-        exclude: list[str],
+        exclude: "Iterable[str] | ExcludeMatcher",
         preserve_wildcard: bool,
     ) -> bool:
         """Determines if a dependency can be bumped in pyproject.toml"""
 
-        constraint = dependency.pretty_constraint
+        return (
+            UpgradeCommand.skip_reason(
+                dependency,
+                only_packages,
+                latest,
+                pinned,
+                exclude,
+                preserve_wildcard,
+            )
+            is None
+        )
+
+    @staticmethod
+    def skip_reason(
+        dependency: Dependency,
+        only_packages: list[str],
+        latest: bool,
+        pinned: bool,
+        exclude: "Iterable[str] | ExcludeMatcher",
+        preserve_wildcard: bool,
+    ) -> str | None:
+        """Returns why a dependency cannot be bumped, None if it can"""
+
+        kind = classify_constraint(dependency.pretty_constraint)
+
+        if dependency.source_type in ("git", "file", "directory"):
+            return f"{dependency.source_type} source"
 
         if is_bumping_prevented(dependency=dependency, exclude=exclude):
-            return False
+            return "excluded"
 
         # check if dependency is in only_packages
         if only_packages and dependency.name not in only_packages:
-            return False
+            return "not selected"
 
-        if preserve_wildcard and is_wildcard(version=constraint):
-            return False
+        if preserve_wildcard and ConstraintKind.WILDCARD in kind:
+            return "wildcard"
 
-        if not latest and any(
-            [
-                not pinned and is_pinned(version=constraint),
-                is_wildcard(version=constraint),
-                is_less_than_or_equal_to(version=constraint),
-                is_less_than(version=constraint),
-                is_greater_than(version=constraint),
-                is_not_equal(version=constraint),
-                is_multiple_requirements(version=constraint),
-            ]
-        ):
-            return False
+        # ranges such as '>=1.2,<2.0' are bumped within their bounds
+        if not latest and not is_bumpable_range(kind):
+            for reason, flag in SKIPPED_KINDS:
+                if flag in kind and (flag != ConstraintKind.PINNED or not pinned):
+                    return reason
 
-        return pinned or not is_pinned(constraint)
+        return "pinned" if not pinned and ConstraintKind.PINNED in kind else None
 
     @staticmethod
     def bump_version_in_pyproject_content(
         dependency: Dependency,
         new_version: str,
         pyproject_content: TOMLDocument,
-    ) -> None:
-        """Bumps versions in pyproject content (pyproject.toml)"""
-
-        poetry_content: dict[str, Any] = pyproject_content.get("tool", {}).get(
-            "poetry", {}
-        )
-
-        for group in dependency.groups:
-            # find section to modify
-            section = {}
+    ) -> bool:
+        """Bumps versions in pyproject content (pyproject.toml)
 
-            if group == "main":
-                section = poetry_content.get("dependencies", {})
-            elif group == "dev" and "dev-dependencies" in poetry_content:
-                # take account for the old `dev-dependencies` section
-                section = poetry_content.get("dev-dependencies", {})
-            else:
-                section = (
-                    poetry_content.get("group", {})
-                    .get(group, {})
-                    .get("dependencies", {})
-                )
+        Returns if any section of pyproject content was modified.
+        """
 
-            # modify section
-            if isinstance(section.get(dependency.pretty_name), str):
-                section[dependency.pretty_name] = new_version
-            elif "version" in section.get(dependency.pretty_name, {}):
-                section[dependency.pretty_name]["version"] = new_version
+        return SectionIndex(pyproject_content).bump(
+            dependency=dependency, new_version=new_version
+        )
 
 
 def is_pinned(version: str) -> bool:
     """Returns if `version` is an exact version."""
-    return version[0].isdigit() or version.startswith("==")
+    return ConstraintKind.PINNED in classify_constraint(version)
 
 
 def is_wildcard(version: str) -> bool:
     """Returns if `version` is a wildcard version."""
-    return version[0] == "*"
+    return ConstraintKind.WILDCARD in classify_constraint(version)
 
 
 def is_less_than(version: str) -> bool:
     """Returns if `version` is a less than version."""
-    return version[0] == "<" and version[1].isdigit()
+    return ConstraintKind.LESS_THAN in classify_constraint(version)
 
 
 def is_greater_than(version: str) -> bool:
     """Returns if `version` is a greater than version."""
-    return version[0] == ">" and version[1].isdigit()
+    return ConstraintKind.GREATER_THAN in classify_constraint(version)
 
 
 def is_less_than_or_equal_to(version: str) -> bool:
     """Returns if `version` is a less than or equal to version."""
-    return version.startswith("<=") and version[2].isdigit()
+    return ConstraintKind.LESS_THAN_OR_EQUAL in classify_constraint(version)
 
 
 def is_not_equal(version: str) -> bool:
     """Returns if `version` is a not equal to version."""
-    return version.startswith("!=")
+    return ConstraintKind.NOT_EQUAL in classify_constraint(version)
 
 
 def is_multiple_requirements(version: str) -> bool:
     """Returns if `version` is a multiple requirements version."""
-    return len(version.split(",")) > 1
+    return ConstraintKind.MULTIPLE in classify_constraint(version)
+
+
+class ExcludeMatcher:
+    """Precompiled matcher of dependency names excluded from bumping
+
+    Plain names and glob patterns such as `types-*` are compared
+    canonicalized, globs must match the whole name. Regular expressions
+    prefixed with `re:` are searched for in the name as declared and in its
+    canonical form. Plain names are looked up in a frozenset, globs are
+    combined into a single compiled expression. `python` is always excluded.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        names = {canonicalize_name("python")}
+        globs = []
+        expressions = []
+
+        for pattern in patterns:
+            if pattern.startswith("re:"):
+                # compiled one by one, inline flags must start each expression
+                try:
+                    expressions.append(re.compile(pattern.removeprefix("re:")))
+                except re.error as e:
+                    raise ValueError(f"invalid pattern '{pattern}' ({e})") from e
+            elif any(char in pattern for char in "*?["):
+                globs.append(fnmatch.translate(canonicalize_name(pattern)))
+            else:
+                names.add(canonicalize_name(pattern))
+
+        self.names = frozenset(names)
+        self.globs = compile_alternatives(globs)
+        self.expressions = tuple(expressions)
+
+    def __contains__(self, name: str) -> bool:
+        canonical_name = canonicalize_name(name)
+
+        return (
+            canonical_name in self.names
+            or (self.globs is not None and self.globs.match(canonical_name) is not None)
+            or any(
+                expression.search(name) is not None
+                or expression.search(canonical_name) is not None
+                for expression in self.expressions
+            )
+        )
+
+
+def compile_alternatives(expressions: list[str]) -> re.Pattern[str] | None:
+    """Returns a single expression matching any of `expressions`"""
+
+    if not expressions:
+        return None
+
+    return re.compile("|".join(f"(?:{expression})" for expression in expressions))
 
 
-def is_bumping_prevented(dependency: Dependency, exclude: list[str]) -> bool:
+def is_bumping_prevented(
+    dependency: Dependency, exclude: Iterable[str] | ExcludeMatcher
+) -> bool:
     """Returns if `dependency` is not bumpable."""
-    exclude.append("python")
+    if not isinstance(exclude, ExcludeMatcher):
+        exclude = ExcludeMatcher(exclude)
 
     if dependency.source_type in ("git", "file", "directory"):
         return True
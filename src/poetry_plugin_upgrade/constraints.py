@@ -0,0 +1,285 @@
+import re
+from enum import Flag, auto
+from functools import lru_cache
+
+from poetry.core.constraints.version import Version, parse_constraint
+
+# operator and version of every clause of a Poetry or PEP 440 constraint
+CLAUSE = re.compile(
+    r"(?P<operator>===|==|!=|~=|<=|>=|<|>|\^|~|=)?\s*(?P<version>[^\s,|<>=!~^]+)"
+)
+# separators of the alternatives of a union, kept when rewriting
+UNION = re.compile(r"(\s*\|\|?\s*)")
+RELEASE = re.compile(r"\d+(?:\.\d+)*")
+
+
+class ConstraintKind(Flag):
+    """Kinds of the clauses of a version constraint
+
+    A constraint of several clauses, such as `>=1.2,<2.0` or `1.0 || 2.0`, has
+    the kind of each clause and `MULTIPLE`, unions also have `UNION`.
+    """
+
+    NONE = 0
+    PINNED = auto()
+    WILDCARD = auto()
+    CARET = auto()
+    TILDE = auto()
+    COMPATIBLE = auto()
+    LESS_THAN = auto()
+    LESS_THAN_OR_EQUAL = auto()
+    GREATER_THAN = auto()
+    GREATER_THAN_OR_EQUAL = auto()
+    NOT_EQUAL = auto()
+    MULTIPLE = auto()
+    UNION = auto()
+
+
+OPERATORS = {
+    "===": ConstraintKind.PINNED,
+    "==": ConstraintKind.PINNED,
+    "=": ConstraintKind.PINNED,
+    "!=": ConstraintKind.NOT_EQUAL,
+    "~=": ConstraintKind.COMPATIBLE,
+    "<=": ConstraintKind.LESS_THAN_OR_EQUAL,
+    ">=": ConstraintKind.GREATER_THAN_OR_EQUAL,
+    "<": ConstraintKind.LESS_THAN,
+    ">": ConstraintKind.GREATER_THAN,
+    "^": ConstraintKind.CARET,
+    "~": ConstraintKind.TILDE,
+}
+
+
+@lru_cache(maxsize=4096)
+def classify_constraint(constraint: str) -> ConstraintKind:
+    """Returns the kinds of the clauses of `constraint`
+
+    Constraints are parsed once and memoized, as the same constraints are
+    declared by many dependencies and projects. Whitespace around operators
+    and clauses is ignored.
+    """
+
+    kind = ConstraintKind.NONE
+    clauses = CLAUSE.findall(constraint)
+
+    for operator, version in clauses:
+        if operator:
+            kind |= OPERATORS[operator]
+        elif version == "*":
+            kind |= ConstraintKind.WILDCARD
+        elif version[0].isdigit():
+            kind |= ConstraintKind.PINNED
+
+    if len(clauses) > 1:
+        kind |= ConstraintKind.MULTIPLE
+
+    if "|" in constraint:
+        kind |= ConstraintKind.UNION
+
+    return kind
+
+
+LOWER_BOUNDS = (
+    ConstraintKind.CARET
+    | ConstraintKind.TILDE
+    | ConstraintKind.COMPATIBLE
+    | ConstraintKind.GREATER_THAN_OR_EQUAL
+)
+UPPER_BOUNDS = (
+    ConstraintKind.LESS_THAN
+    | ConstraintKind.LESS_THAN_OR_EQUAL
+    | ConstraintKind.NOT_EQUAL
+)
+
+
+def is_bumpable_range(kind: ConstraintKind) -> bool:
+    """Returns if a constraint of several clauses has a lower bound to raise
+
+    Ranges such as `>=1.2,<2.0` qualify, unions and ranges with pins,
+    wildcards or exclusive lower bounds do not.
+    """
+
+    return (
+        ConstraintKind.MULTIPLE in kind
+        and ConstraintKind.UNION not in kind
+        and bool(kind & LOWER_BOUNDS)
+        and not kind & ~(LOWER_BOUNDS | UPPER_BOUNDS | ConstraintKind.MULTIPLE)
+    )
+
+
+@lru_cache(maxsize=4096)
+def bump_constraint(constraint: str, candidate: str) -> str:
+    """Returns `constraint` rewritten to require at least `candidate`
+
+    Operators, precision and formatting are preserved, `^1.2` becomes `^1.5`
+    for candidate `1.5.3`. Carets keep the components up to the first non
+    zero one and pins take the whole candidate. Single upper bounds are kept,
+    the upper bounds of a range are raised when they exclude the candidate.
+    Of a union, the first alternative allowing the candidate is rewritten,
+    or the last one. Results are memoized per constraint and candidate.
+    """
+
+    if "|" in constraint:
+        parts = UNION.split(constraint)
+        alternatives = parts[::2]
+        parsed = Version.parse(candidate)
+        index = next(
+            (
+                index
+                for index, alternative in enumerate(alternatives)
+                if parse_constraint(alternative).allows(parsed)
+            ),
+            len(alternatives) - 1,
+        )
+        parts[2 * index] = bump_constraint(alternatives[index], candidate)
+
+        return "".join(parts)
+
+    clauses = list(CLAUSE.finditer(constraint))
+
+    if not clauses:
+        return candidate
+
+    if len(clauses) > 1:
+        return bump_range(constraint, clauses, candidate)
+
+    operator, version = clauses[0].group("operator", "version")
+
+    if operator in ("<", "<="):
+        return constraint
+
+    # wildcards and exclusions become the candidate
+    if (not operator and version == "*") or operator == "!=":
+        return candidate
+
+    return replace_version(constraint, clauses[0], bump_clause(clauses[0], candidate))
+
+
+def bump_range(constraint: str, clauses: list[re.Match[str]], candidate: str) -> str:
+    """Returns a range of several clauses raised to `candidate`
+
+    Lower bounds are raised to the candidate, upper bounds excluding it are
+    raised past it. Exclusions are kept, unless they exclude the candidate.
+    """
+
+    parsed = Version.parse(candidate)
+
+    for index in reversed(range(len(clauses))):
+        clause = clauses[index]
+        operator = clause.group("operator")
+
+        if operator == "!=":
+            if not parse_constraint(clause.group()).allows(parsed):
+                constraint = remove_clause(constraint, clauses, index)
+            continue
+
+        if clause.group("version") == "*":
+            continue
+
+        if operator in ("<", "<="):
+            new_version = raise_upper_bound(clause, candidate)
+        else:
+            new_version = bump_clause(clause, candidate)
+
+        constraint = replace_version(constraint, clause, new_version)
+
+    return constraint or candidate
+
+
+def bump_clause(clause: re.Match[str], candidate: str) -> str:
+    """Returns the version of a lower bound or pin raised to `candidate`"""
+
+    operator, version = clause.group("operator", "version")
+
+    if operator in (None, "==", "===", "="):
+        # pins keep the whole candidate, or the precision of their wildcard
+        if version.endswith(".*"):
+            return truncate(candidate, version.count(".")) + ".*"
+        return candidate
+
+    return truncate(candidate, precision(version), caret=operator == "^")
+
+
+def raise_upper_bound(clause: re.Match[str], candidate: str) -> str:
+    """Returns the version of an upper bound allowing `candidate`
+
+    Bounds already allowing the candidate are kept. Exclusive bounds are
+    raised at their last non zero component, `<2.0` becomes `<3.0` for
+    candidate `2.3.1`.
+    """
+
+    operator, version = clause.group("operator", "version")
+    bound = Version.parse(version)
+    new_version = Version.parse(candidate)
+
+    if new_version < bound or (operator == "<=" and new_version == bound):
+        return version
+
+    release = RELEASE.match(version)
+    if operator == "<=" or release is None:
+        return candidate
+
+    components = [int(component) for component in release.group().split(".")]
+    position = max(
+        (index for index, component in enumerate(components) if component),
+        default=len(components) - 1,
+    )
+    parts = [*new_version.release.to_parts(), *[0] * len(components)]
+    raised = [*parts[:position], parts[position] + 1]
+
+    return ".".join(
+        str(component) for component in raised + [0] * (len(components) - position - 1)
+    )
+
+
+def precision(version: str) -> int:
+    """Returns the number of release components of `version`"""
+
+    release = RELEASE.match(version)
+
+    return release.group().count(".") + 1 if release is not None else 0
+
+
+def truncate(candidate: str, components: int, caret: bool = False) -> str:
+    """Returns the first `components` release components of `candidate`
+
+    Candidates with pre, post, dev or local segments are kept whole. With
+    `caret`, components up to the first non zero one are kept.
+    """
+
+    if not components or RELEASE.fullmatch(candidate) is None:
+        return candidate
+
+    parts = candidate.split(".")
+
+    if caret:
+        first = next(
+            (index for index, part in enumerate(parts) if int(part)), len(parts) - 1
+        )
+        components = max(components, first + 1)
+
+    return ".".join(parts[:components])
+
+
+def remove_clause(constraint: str, clauses: list[re.Match[str]], index: int) -> str:
+    """Returns `constraint` without its clause at `index` and its separator
+
+    Clauses after `index` must not have been rewritten yet.
+    """
+
+    if index:
+        start, end = clauses[index - 1].end(), clauses[index].end()
+    elif len(clauses) > 1:
+        start, end = clauses[index].start(), clauses[index + 1].start()
+    else:
+        start, end = clauses[index].span()
+
+    return constraint[:start] + constraint[end:]
+
+
+def replace_version(constraint: str, clause: re.Match[str], version: str) -> str:
+    """Returns `constraint` with the version of `clause` replaced"""
+
+    start, end = clause.span("version")
+
+    return constraint[:start] + version + constraint[end:]
@@ -0,0 +1,78 @@
+import asyncio
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+
+DEFAULT_MAX_PER_HOST = 10
+
+
+@dataclass
+class LatestVersions:
+    """Outcome of a batch of latest version lookups"""
+
+    versions: dict[str, str | None] = field(default_factory=dict)
+    errors: dict[str, BaseException] = field(default_factory=dict)
+
+
+async def gather_latest_versions(
+    names: Iterable[str],
+    fetch: Callable[..., str | None],
+    host: Callable[[str], str],
+    max_per_host: int = DEFAULT_MAX_PER_HOST,
+    deadline: float | None = None,
+) -> LatestVersions:
+    """Runs the blocking `fetch` of every package concurrently
+
+    At most `max_per_host` lookups are in flight per host returned by `host`,
+    on a dedicated pool sized for every host. Lookups still running after
+    `deadline` seconds are abandoned and the call returns, `fetch` is given
+    the remaining time as its `timeout` keyword. A failing lookup is reported
+    in `errors` without aborting the rest of the batch.
+    """
+
+    result = LatestVersions()
+    names = list(dict.fromkeys(names))
+    hosts = {name: host(name) for name in names}
+
+    if not names:
+        return result
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    semaphores = {name: asyncio.Semaphore(max_per_host) for name in set(hosts.values())}
+    executor = ThreadPoolExecutor(max_workers=max_per_host * len(semaphores))
+
+    async def fetch_one(name: str) -> str | None:
+        async with semaphores[hosts[name]]:
+            if deadline is None:
+                return await loop.run_in_executor(executor, fetch, name)
+
+            remaining = deadline - (loop.time() - start)
+            if remaining <= 0:
+                raise TimeoutError(f"Deadline of {deadline}s exceeded")
+
+            return await loop.run_in_executor(
+                executor, partial(fetch, name, timeout=remaining)
+            )
+
+    tasks = {asyncio.ensure_future(fetch_one(name)): name for name in names}
+
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+    finally:
+        # abandoned lookups must not hold the event loop open
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for task in pending:
+        task.cancel()
+        result.errors[tasks[task]] = TimeoutError(f"Deadline of {deadline}s exceeded")
+
+    for task in done:
+        exception = task.exception()
+        if exception is not None:
+            result.errors[tasks[task]] = exception
+        else:
+            result.versions[tasks[task]] = task.result()
+
+    return result
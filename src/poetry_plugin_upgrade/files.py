@@ -0,0 +1,64 @@
+import os
+import tempfile
+from collections.abc import Iterable
+from pathlib import Path
+
+import tomlkit
+from tomlkit.toml_document import TOMLDocument
+
+
+def atomic_write(path: Path, content: bytes) -> None:
+    """Writes `content` to `path` so readers never see a partial file"""
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+        Path(tmp_path).replace(path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def write_document(path: Path, document: TOMLDocument) -> None:
+    """Writes a TOML document to `path` atomically, as is"""
+
+    atomic_write(path, document.as_string().encode())
+
+
+class ProjectSnapshot:
+    """Byte-for-byte snapshot of project files such as pyproject.toml
+
+    Files that did not exist when the snapshot was taken are removed on
+    restore.
+    """
+
+    def __init__(self, paths: Iterable[Path]) -> None:
+        self.contents: dict[Path, bytes | None] = {
+            path: path.read_bytes() if path.exists() else None for path in paths
+        }
+
+    def document(self, path: Path) -> TOMLDocument:
+        """Parses the snapshot of the TOML file at `path`
+
+        Line endings are kept as they are, write the document back with
+        `write_document`.
+        """
+
+        content = self.contents[path]
+        if content is None:
+            raise FileNotFoundError(path)
+
+        return tomlkit.parse(content.decode())
+
+    def restore(self) -> None:
+        """Restores every file of the snapshot atomically"""
+
+        for path, content in self.contents.items():
+            if content is None:
+                path.unlink(missing_ok=True)
+            else:
+                atomic_write(path, content)
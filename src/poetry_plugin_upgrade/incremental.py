@@ -0,0 +1,266 @@
+import json
+import threading
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass
+from http import HTTPStatus
+from pathlib import Path
+from typing import cast
+
+import requests
+from poetry.core.packages.package import Package
+from poetry.repositories import Repository, RepositoryPool
+from poetry.repositories.http_repository import HTTPRepository
+from poetry.repositories.pypi_repository import PyPiRepository
+from poetry.utils.authenticator import Authenticator
+from requests.auth import HTTPBasicAuth
+
+from poetry_plugin_upgrade.cache import MetadataCache
+from poetry_plugin_upgrade.files import atomic_write
+from poetry_plugin_upgrade.limits import SourceLimiter
+from poetry_plugin_upgrade.resolver import CachedVersionSelector
+
+STATE_FILE = ".poetry-upgrade-state.json"
+STATE_VERSION = 1
+SIMPLE_JSON = "application/vnd.pypi.simple.v1+json"
+
+
+@dataclass
+class LookupState:
+    """Candidate of a lookup and the version of the index page it came from"""
+
+    index_url: str
+    candidate: str | None
+    serial: int | None = None
+    etag: str | None = None
+
+
+@dataclass
+class Probe:
+    """Outcome of a conditional request for the index page of a package"""
+
+    changed: bool
+    serial: int | None = None
+    etag: str | None = None
+
+
+class UpgradeState:
+    """State of the lookups of the previous incremental run of a project
+
+    Only lookups of the current run are kept when the state is saved, so the
+    state file does not grow with dependencies that were removed.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.previous: dict[str, LookupState] = {}
+        self.current: dict[str, LookupState] = {}
+        self._lock = threading.Lock()
+
+        try:
+            content = json.loads(path.read_text())
+            if content["version"] == STATE_VERSION:
+                self.previous = {
+                    key: LookupState(**state)
+                    for key, state in content["lookups"].items()
+                }
+        except (OSError, KeyError, TypeError, ValueError):
+            # a missing or unreadable state resolves every lookup again
+            self.previous = {}
+
+    def get(self, key: str, index_url: str) -> LookupState | None:
+        """Returns the state of a lookup of the previous run"""
+
+        state = self.previous.get(key)
+
+        if state is None or state.index_url != index_url:
+            return None
+
+        return state
+
+    def set(self, key: str, state: LookupState) -> None:
+        """Records the state of a lookup of the current run"""
+
+        with self._lock:
+            self.current[key] = state
+
+    def save(self) -> None:
+        """Writes the state of the current run"""
+
+        with self._lock:
+            lookups = {
+                key: asdict(state) for key, state in sorted(self.current.items())
+            }
+
+        atomic_write(
+            self.path,
+            json.dumps(
+                {"version": STATE_VERSION, "lookups": lookups}, indent=2
+            ).encode(),
+        )
+
+
+def probe_url(repositories: list[Repository], package_name: str) -> str | None:
+    """Returns the URL telling if a package changed on its only repository
+
+    The PyPI JSON API is used for PyPI, the simple API page for other
+    package indexes. Lookups spread over several repositories, or sent to
+    repositories that are not package indexes, cannot be probed.
+    """
+
+    if len(repositories) != 1 or not isinstance(repositories[0], HTTPRepository):
+        return None
+
+    url = repositories[0].url.rstrip("/")
+
+    if isinstance(repositories[0], PyPiRepository):
+        return f"{url.removesuffix('/simple')}/pypi/{package_name}/json"
+
+    return f"{url}/{package_name}/"
+
+
+def probe(authenticator: Authenticator, url: str, state: LookupState | None) -> Probe:
+    """Asks the package index if a package changed since `state`
+
+    The request goes through the session of the repository's `authenticator`
+    with its credentials and certificates, without its retries. It is
+    conditional on the ETag of the state. A package is unchanged when the
+    index answers 304 or sends the same `X-PyPI-Last-Serial` as before.
+    Failed probes count as changed.
+    """
+
+    headers = {"Accept": f"{SIMPLE_JSON}, application/json"}
+    if state is not None and state.etag:
+        headers["If-None-Match"] = state.etag
+
+    credential = authenticator.get_credentials_for_url(url)
+    certs = authenticator.get_certs_for_url(url)
+    verify = certs.cert or certs.verify
+
+    try:
+        response = authenticator.get_session(url).get(
+            url,
+            headers=headers,
+            auth=(
+                HTTPBasicAuth(credential.username or "", credential.password or "")
+                if credential.username is not None or credential.password is not None
+                else None
+            ),
+            verify=str(verify) if isinstance(verify, Path) else verify,
+            cert=str(certs.client_cert) if certs.client_cert is not None else None,
+            timeout=10,
+        )
+    except (requests.RequestException, OSError):
+        return Probe(changed=True)
+
+    serial = response.headers.get("X-PyPI-Last-Serial")
+    probed = Probe(
+        changed=True,
+        serial=int(serial) if serial and serial.isdigit() else None,
+        etag=response.headers.get("ETag"),
+    )
+
+    if state is None:
+        return probed
+
+    if response.status_code == HTTPStatus.NOT_MODIFIED:
+        return Probe(
+            changed=False,
+            serial=probed.serial or state.serial,
+            etag=probed.etag or state.etag,
+        )
+
+    if (
+        response.status_code == HTTPStatus.OK
+        and probed.serial is not None
+        and probed.serial == state.serial
+    ):
+        probed.changed = False
+
+    return probed
+
+
+class IncrementalVersionSelector(CachedVersionSelector):
+    """Version selector re-resolving only packages changed since the last run
+
+    Every lookup first probes the index page of its package. Unchanged
+    packages are served from the state of the previous run, changed ones are
+    resolved again bypassing the metadata cache. Lookups that cannot be
+    probed are resolved as usual. Probes are sent with the credentials of
+    their repository and wait for a slot of its limiter, if any.
+    """
+
+    def __init__(
+        self,
+        pool: RepositoryPool,
+        cache: MetadataCache,
+        state: UpgradeState,
+        refresh: bool = False,
+        limiters: dict[str, SourceLimiter] | None = None,
+    ) -> None:
+        super().__init__(pool, cache, refresh=refresh)
+        self.state = state
+        self.limiters = limiters or {}
+
+    def find_cached_candidate(
+        self,
+        package_name: str,
+        target_package_version: str | None = None,
+        allow_prereleases: bool | None = None,
+        source: str | None = None,
+        refresh: bool | None = None,
+    ) -> tuple[Package | None, bool]:
+        key = self.cache_key(package_name, target_package_version, allow_prereleases)
+        index_url = self.index_url(source)
+        repositories = self.repositories(source)
+        url = probe_url(repositories, package_name)
+
+        if url is None:
+            return super().find_cached_candidate(
+                package_name=package_name,
+                target_package_version=target_package_version,
+                allow_prereleases=allow_prereleases,
+                source=source,
+                refresh=refresh,
+            )
+
+        # probe_url only returns URLs of a single HTTP repository
+        repository = cast(HTTPRepository, repositories[0])
+        previous = self.state.get(key, index_url)
+        limiter = self.limiters.get(repository.name)
+        with limiter.slot() if limiter is not None else nullcontext():
+            probed = probe(repository.session, url, previous)
+
+        if previous is not None and not probed.changed and not self.refresh:
+            candidate = previous.candidate
+            self.state.set(
+                key,
+                LookupState(
+                    index_url=index_url,
+                    candidate=candidate,
+                    serial=probed.serial,
+                    etag=probed.etag,
+                ),
+            )
+            if candidate is None:
+                return None, True
+            return Package(name=package_name, version=candidate), True
+
+        found, cached = super().find_cached_candidate(
+            package_name=package_name,
+            target_package_version=target_package_version,
+            allow_prereleases=allow_prereleases,
+            source=source,
+            # the package changed, cached candidates may be outdated
+            refresh=True,
+        )
+        self.state.set(
+            key,
+            LookupState(
+                index_url=index_url,
+                candidate=found.pretty_version if found is not None else None,
+                serial=probed.serial,
+                etag=probed.etag,
+            ),
+        )
+
+        return found, cached
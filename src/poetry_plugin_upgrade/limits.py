@@ -0,0 +1,186 @@
+import math
+import threading
+import time
+from collections.abc import Callable, Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any
+
+import requests
+from poetry.repositories import RepositoryPool
+from poetry.repositories.http_repository import HTTPRepository
+
+from poetry_plugin_upgrade.session import resize_adapters
+
+SETTINGS = ("pool-size", "max-in-flight", "rate-limit", "burst")
+
+
+@dataclass(frozen=True)
+class SourceLimit:
+    """Limits of the requests sent to a package source
+
+    `rate_limit` is in requests per second, `burst` is the number of requests
+    that can be sent at once after an idle period.
+    """
+
+    pool_size: int | None = None
+    max_in_flight: int | None = None
+    rate_limit: float | None = None
+    burst: int | None = None
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled with `rate` tokens per second"""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Takes a token, waiting for one if needed, returns the seconds waited"""
+
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # tokens may go negative, later callers wait for their own turn
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        if wait:
+            self._sleep(wait)
+
+        return wait
+
+
+class SourceLimiter:
+    """Bounds the requests in flight and the request rate of a package source"""
+
+    def __init__(self, limit: SourceLimit) -> None:
+        self.limit = limit
+        self._in_flight = (
+            threading.BoundedSemaphore(limit.max_in_flight)
+            if limit.max_in_flight is not None
+            else None
+        )
+        self._bucket = (
+            TokenBucket(
+                rate=limit.rate_limit,
+                capacity=limit.burst or max(1, math.ceil(limit.rate_limit)),
+            )
+            if limit.rate_limit is not None
+            else None
+        )
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Holds a slot for a single request"""
+
+        if self._in_flight is not None:
+            self._in_flight.acquire()
+
+        try:
+            if self._bucket is not None:
+                self._bucket.acquire()
+            yield
+        finally:
+            if self._in_flight is not None:
+                self._in_flight.release()
+
+
+def load_limits(content: Mapping[str, Any]) -> dict[str, SourceLimit]:
+    """Returns the limits of every source configured in pyproject content
+
+    Limits are read from `[tool.poetry-plugin-upgrade.sources.<name>]`
+    tables, raises ValueError for invalid settings.
+    """
+
+    sources = (
+        content.get("tool", {}).get("poetry-plugin-upgrade", {}).get("sources", {})
+    )
+    limits = {}
+
+    for name, settings in sources.items():
+        unknown = set(settings) - set(SETTINGS)
+        if unknown:
+            raise ValueError(
+                f"unknown setting '{sorted(unknown)[0]}' of source '{name}'"
+            )
+
+        for key, value in settings.items():
+            if (
+                isinstance(value, bool)
+                or not isinstance(value, int | float)
+                or value <= 0
+                or (key != "rate-limit" and not isinstance(value, int))
+            ):
+                kind = (
+                    "a positive number" if key == "rate-limit" else "a positive integer"
+                )
+                raise ValueError(f"'{key}' of source '{name}' must be {kind}")
+
+        limits[name.lower()] = SourceLimit(
+            pool_size=settings.get("pool-size"),
+            max_in_flight=settings.get("max-in-flight"),
+            rate_limit=settings.get("rate-limit"),
+            burst=settings.get("burst"),
+        )
+
+    return limits
+
+
+def apply_limits(
+    pool: RepositoryPool, limits: Mapping[str, SourceLimit]
+) -> dict[str, SourceLimiter]:
+    """Installs the limits of each source on the repositories of `pool`
+
+    Every request of a limited repository, lookups and prefetches alike,
+    waits for a slot of its source. The connection pools of its sessions are
+    resized to `pool_size`. Returns the limiter of each limited repository.
+    """
+
+    limiters = {}
+
+    for repository in pool.all_repositories:
+        limit = limits.get(repository.name.lower())
+        if limit is None or not isinstance(repository, HTTPRepository):
+            continue
+
+        limiter = limiters[repository.name] = SourceLimiter(limit)
+        authenticator = repository.session
+
+        if limit.pool_size is not None:
+            resize_adapters(authenticator.get_session(repository.url), limit.pool_size)
+
+        authenticator.request = limited(  # type: ignore[method-assign]
+            authenticator.request, limiter
+        )
+
+    return limiters
+
+
+def limited(
+    request: Callable[..., requests.Response], limiter: SourceLimiter
+) -> Callable[..., requests.Response]:
+    """Returns `request` waiting for a slot of `limiter` on every call"""
+
+    @wraps(request)
+    def wrapper(*args: Any, **kwargs: Any) -> requests.Response:
+        with limiter.slot():
+            return request(*args, **kwargs)
+
+    return wrapper
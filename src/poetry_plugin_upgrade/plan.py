@@ -0,0 +1,116 @@
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from cleo.io.io import IO
+from cleo.io.outputs.output import Type as OutputType
+from packaging.utils import canonicalize_name
+
+FORMATS = ("text", "json", "ndjson")
+PLAN_VERSION = 1
+
+
+@dataclass
+class PlanRecord:
+    """Planned change of a dependency constraint
+
+    Dependencies that are not bumped have no new constraint and the reason
+    they are skipped, such as `pinned`, `wildcard`, `excluded` or
+    `git source`.
+    """
+
+    group: str
+    name: str
+    old_constraint: str
+    new_constraint: str | None = None
+    candidate: str | None = None
+    skip_reason: str | None = None
+
+
+class PlanWriter:
+    """Streams plan records as a JSON array or as newline-delimited JSON
+
+    Records are written unformatted as soon as they are computed. The JSON
+    array is opened with the first record and closed by `close`.
+    """
+
+    def __init__(self, io: IO, format: str) -> None:
+        self.io = io
+        self.format = format
+        self.records = 0
+
+    def write(self, record: PlanRecord) -> None:
+        """Writes a single record"""
+
+        line = json.dumps(asdict(record))
+
+        if self.format == "json":
+            line = ("[\n" if not self.records else ",\n") + line
+
+        self.records += 1
+        self.io.write(line, new_line=self.format == "ndjson", type=OutputType.RAW)
+
+    def close(self) -> None:
+        """Ends the output, closing the JSON array"""
+
+        if self.format == "json":
+            self.io.write_line("\n]" if self.records else "[]", type=OutputType.RAW)
+
+
+@dataclass
+class UpgradePlan:
+    """Plan file resolved once and applied without looking versions up again
+
+    `latest` records if candidates were resolved with `--latest`, otherwise a
+    candidate is only applied when the constraint it bumps allows it.
+    """
+
+    latest: bool
+    records: list[PlanRecord] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, path: Path) -> "UpgradePlan":
+        """Reads a plan file, raises ValueError if it is not a valid plan"""
+
+        content = json.loads(path.read_text())
+
+        try:
+            if content["version"] != PLAN_VERSION:
+                raise ValueError(f"unsupported plan version {content['version']}")
+
+            return cls(
+                latest=bool(content["latest"]),
+                records=[PlanRecord(**record) for record in content["records"]],
+            )
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"malformed plan ({e!r})") from e
+
+    def dump(self, path: Path) -> None:
+        """Writes the plan file"""
+
+        path.write_text(
+            json.dumps(
+                {
+                    "version": PLAN_VERSION,
+                    "latest": self.latest,
+                    "records": [asdict(record) for record in self.records],
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+
+    def candidates(self) -> dict[tuple[str, str], str]:
+        """Returns the candidate of every resolved (group, name) pair
+
+        Groups and names are canonicalized.
+        """
+
+        return {
+            (canonicalize_name(group), canonicalize_name(record.name)): (
+                record.candidate
+            )
+            for record in self.records
+            if record.candidate is not None
+            for group in record.group.split(",")
+        }
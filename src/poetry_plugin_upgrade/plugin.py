@@ -1,10 +1,17 @@
+from typing import TYPE_CHECKING
+
 from poetry.plugins.application_plugin import ApplicationPlugin
 
 import poetry_plugin_upgrade
-from poetry_plugin_upgrade.command import UpgradeCommand
 
+if TYPE_CHECKING:
+    from poetry_plugin_upgrade.command import UpgradeCommand
+
+
+def factory() -> "UpgradeCommand":
+    # imported on first use, other Poetry commands do not load the command
+    from poetry_plugin_upgrade.command import UpgradeCommand
 
-def factory() -> UpgradeCommand:
     return UpgradeCommand()
 
 
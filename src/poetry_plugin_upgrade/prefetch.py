@@ -0,0 +1,95 @@
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from packaging.utils import NormalizedName, canonicalize_name
+from poetry.repositories.http_repository import HTTPRepository
+from poetry.repositories.repository_pool import Priority
+
+from poetry_plugin_upgrade.resolver import CachedVersionSelector, CandidateLookup
+from poetry_plugin_upgrade.timings import Timings
+
+
+@dataclass
+class SourcePrefetch:
+    """Index pages of packages to fetch from a single repository"""
+
+    repository: HTTPRepository
+    names: dict[NormalizedName, None] = field(default_factory=dict)
+    failed: list[NormalizedName] = field(default_factory=list)
+
+
+def group_by_source(
+    selector: CachedVersionSelector, lookups: Iterable[CandidateLookup]
+) -> list[SourcePrefetch]:
+    """Returns the pages each repository is asked for by `lookups`
+
+    Lookups served from the metadata cache are left out. Lookups without a
+    source are sent to every repository searched by default, supplemental
+    repositories are only searched when the others have nothing.
+    """
+
+    sources: dict[str, SourcePrefetch] = {}
+
+    for lookup in lookups:
+        if selector.is_cached(lookup):
+            continue
+
+        for repository in selector.repositories(lookup.source):
+            if not isinstance(repository, HTTPRepository) or (
+                lookup.source is None
+                and selector._pool.get_priority(repository.name)  # noqa: SLF001
+                is Priority.SUPPLEMENTAL
+            ):
+                continue
+
+            prefetch = sources.setdefault(
+                repository.name, SourcePrefetch(repository=repository)
+            )
+            prefetch.names[canonicalize_name(lookup.package_name)] = None
+
+    return list(sources.values())
+
+
+def prefetch_pages(
+    sources: list[SourcePrefetch], jobs: int, timings: Timings | None = None
+) -> None:
+    """Fetches the index page of every package concurrently
+
+    Pages are kept by the `get_page` cache of each repository, so selecting
+    candidates afterwards runs in memory. Every source has its own pool of at
+    most `jobs` threads and all sources are fetched at once. Failed fetches
+    are recorded in `failed` of their source, the lookup reports the error.
+    """
+
+    executors = [
+        ThreadPoolExecutor(max_workers=jobs, thread_name_prefix=source.repository.name)
+        for source in sources
+    ]
+
+    try:
+        futures: list[tuple[SourcePrefetch, NormalizedName, Future[None]]] = [
+            (source, name, executor.submit(fetch_page, source, name, timings))
+            for source, executor in zip(sources, executors, strict=True)
+            for name in source.names
+        ]
+
+        for source, name, future in futures:
+            if future.exception() is not None:
+                source.failed.append(name)
+    finally:
+        for executor in executors:
+            executor.shutdown()
+
+
+def fetch_page(
+    source: SourcePrefetch, name: NormalizedName, timings: Timings | None
+) -> None:
+    """Fetches the index page of a package into the cache of its repository"""
+
+    if timings is None:
+        source.repository.get_page(name)
+        return
+
+    with timings.span("prefetch", source=source.repository.name, package=name):
+        source.repository.get_page(name)
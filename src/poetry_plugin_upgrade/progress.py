@@ -0,0 +1,57 @@
+from collections.abc import Iterable
+
+from cleo.io.io import IO
+
+
+class Progress:
+    """Live done, pending and failed counters of a batch of lookups
+
+    Events are written to the error output so the output of `--dry-run` can
+    still be piped. On a terminal every event is printed above a status line
+    that is redrawn in place, otherwise each event is printed on a single line
+    prefixed with the counters.
+    """
+
+    def __init__(self, io: IO, total: int) -> None:
+        self.io = io
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.live = io.error_output.is_decorated()
+
+    @property
+    def pending(self) -> int:
+        return self.total - self.done - self.failed
+
+    @property
+    def status(self) -> str:
+        return (
+            f"Resolving dependencies: <info>{self.done}</> done, "
+            f"<comment>{self.pending}</> pending, <error>{self.failed}</> failed"
+        )
+
+    def advance(self, events: Iterable[str], failed: bool = False) -> None:
+        """Reports the events of a completed lookup"""
+
+        if failed:
+            self.failed += 1
+        else:
+            self.done += 1
+
+        if not self.live:
+            counters = f"[{self.done + self.failed}/{self.total}]"
+            for event in events:
+                self.io.write_error_line(f"{counters} {event}")
+            return
+
+        for event in events:
+            self.io.overwrite_error(event)
+            self.io.write_error_line("")
+        self.io.write_error(self.status)
+
+    def finish(self) -> None:
+        """Ends the status line"""
+
+        if self.live and self.total:
+            self.io.overwrite_error(self.status)
+            self.io.write_error_line("")
@@ -0,0 +1,331 @@
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import AbstractContextManager, nullcontext
+from typing import NamedTuple
+
+from poetry.core.packages.package import Package
+from poetry.repositories import Repository, RepositoryPool
+from poetry.version.version_selector import VersionSelector
+
+from poetry_plugin_upgrade.cache import MetadataCache
+from poetry_plugin_upgrade.timings import Timings
+
+# what to do with failed lookups
+ON_ERROR = ("abort", "skip", "retry")
+DEFAULT_BACKOFF = 0.5
+
+
+class CandidateLookup(NamedTuple):
+    """Arguments of a single `VersionSelector.find_best_candidate` call"""
+
+    package_name: str
+    target_package_version: str
+    allow_prereleases: bool | None
+    source: str | None
+
+
+class Resolution(NamedTuple):
+    """Outcome of a single candidate lookup
+
+    `cached` is None when the selector does not report cache hits.
+    `attempts` counts the lookups sent, including retries.
+    """
+
+    lookup: CandidateLookup
+    candidate: Package | None
+    seconds: float
+    cached: bool | None = None
+    error: Exception | None = None
+    attempts: int = 1
+
+
+def find_candidate(
+    selector: VersionSelector, lookup: CandidateLookup
+) -> Package | None:
+    """Finds the best candidate for a single lookup"""
+
+    return selector.find_best_candidate(**lookup._asdict())
+
+
+def resolve_lookup(
+    selector: VersionSelector, lookup: CandidateLookup, timings: Timings | None
+) -> Resolution:
+    """Finds the best candidate for a single lookup, timing it
+
+    Errors are returned in the resolution instead of being raised.
+    """
+
+    start = time.perf_counter()
+    span: AbstractContextManager[None] = (
+        timings.span("find_best_candidate", package=lookup.package_name)
+        if timings is not None
+        else nullcontext()
+    )
+
+    try:
+        with span:
+            if isinstance(selector, CachedVersionSelector):
+                candidate, cached = selector.find_cached_candidate(**lookup._asdict())
+            else:
+                candidate, cached = find_candidate(selector, lookup), None
+    except Exception as e:
+        return Resolution(
+            lookup=lookup,
+            candidate=None,
+            seconds=time.perf_counter() - start,
+            error=e,
+        )
+
+    return Resolution(
+        lookup=lookup,
+        candidate=candidate,
+        seconds=time.perf_counter() - start,
+        cached=cached,
+    )
+
+
+def resolve_candidates(
+    selector: VersionSelector,
+    lookups: Sequence[CandidateLookup],
+    jobs: int | None = None,
+    timings: Timings | None = None,
+    on_resolved: Callable[[Resolution], None] | None = None,
+    on_error: str = "abort",
+    retries: int = 0,
+    backoff: float = DEFAULT_BACKOFF,
+) -> list[Package | None]:
+    """Resolves the best candidate of every lookup concurrently
+
+    Lookups are spread over a pool of at most `jobs` threads, the returned
+    candidates are in the same order as `lookups`. Every lookup is recorded
+    in `timings` when given and passed to `on_resolved` as soon as it
+    completes. A failing lookup is handled according to `on_error`: `abort`
+    cancels the pending lookups and raises its error, `skip` resolves it to
+    no candidate and `retry` queues it again up to `retries` times, waiting
+    `backoff` seconds doubled on every attempt, before aborting.
+    """
+
+    resolutions: dict[CandidateLookup, Resolution] = {}
+
+    def attempt(lookup: CandidateLookup, attempts: int) -> Resolution:
+        if attempts > 1:
+            time.sleep(backoff * 2 ** (attempts - 2))
+        return resolve_lookup(selector, lookup, timings)._replace(attempts=attempts)
+
+    def retrying(resolution: Resolution) -> bool:
+        return (
+            resolution.error is not None
+            and on_error == "retry"
+            and resolution.attempts <= retries
+        )
+
+    def resolved(resolution: Resolution) -> None:
+        resolutions[resolution.lookup] = resolution
+        if on_resolved is not None:
+            on_resolved(resolution)
+        if resolution.error is not None and on_error != "skip":
+            raise resolution.error
+
+    if jobs == 1 or len(lookups) <= 1:
+        queue = deque((lookup, 1) for lookup in lookups)
+        while queue:
+            resolution = attempt(*queue.popleft())
+            if retrying(resolution):
+                queue.append((resolution.lookup, resolution.attempts + 1))
+            else:
+                resolved(resolution)
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            pending = {executor.submit(attempt, lookup, 1) for lookup in lookups}
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        resolution = future.result()
+                        if retrying(resolution):
+                            # failed lookups go to the back of the queue
+                            pending.add(
+                                executor.submit(
+                                    attempt, resolution.lookup, resolution.attempts + 1
+                                )
+                            )
+                        else:
+                            resolved(resolution)
+            except Exception:
+                executor.shutdown(cancel_futures=True)
+                raise
+
+    return [resolutions[lookup].candidate for lookup in lookups]
+
+
+class LookupPlan:
+    """Distinct candidate lookups of a run
+
+    Dependencies declared in several groups share the same lookup, so each
+    distinct lookup is only sent to the package index once.
+    """
+
+    def __init__(self, lookups: Iterable[CandidateLookup]) -> None:
+        self.requested = 0
+        self.lookups: list[CandidateLookup] = []
+
+        seen: set[CandidateLookup] = set()
+        for lookup in lookups:
+            self.requested += 1
+            if lookup not in seen:
+                seen.add(lookup)
+                self.lookups.append(lookup)
+
+    @property
+    def saved(self) -> int:
+        """Returns the number of index round-trips saved by deduplication"""
+
+        return self.requested - len(self.lookups)
+
+    def resolve(
+        self,
+        selector: VersionSelector,
+        jobs: int | None = None,
+        timings: Timings | None = None,
+        on_resolved: Callable[[Resolution], None] | None = None,
+        on_error: str = "abort",
+        retries: int = 0,
+    ) -> dict[CandidateLookup, Package | None]:
+        """Resolves every distinct lookup once"""
+
+        candidates = resolve_candidates(
+            selector=selector,
+            lookups=self.lookups,
+            jobs=jobs,
+            timings=timings,
+            on_resolved=on_resolved,
+            on_error=on_error,
+            retries=retries,
+        )
+
+        return dict(zip(self.lookups, candidates, strict=True))
+
+
+class CachedVersionSelector(VersionSelector):
+    """Version selector backed by a persistent metadata cache
+
+    Candidates are cached per lookup and index URL. Fresh entries are served
+    without contacting the package index, `refresh` ignores their freshness
+    and `offline` never contacts the package index at all.
+    """
+
+    def __init__(
+        self,
+        pool: RepositoryPool,
+        cache: MetadataCache,
+        offline: bool = False,
+        refresh: bool = False,
+    ) -> None:
+        super().__init__(pool)
+        self.cache = cache
+        self.offline = offline
+        self.refresh = refresh
+
+    def repositories(self, source: str | None) -> list[Repository]:
+        """Returns the repositories a lookup is sent to"""
+
+        if source and self._pool.has_repository(source):
+            return [self._pool.repository(source)]
+
+        return self._pool.repositories
+
+    def index_url(self, source: str | None) -> str:
+        """Returns the URL of the package indexes a lookup is sent to"""
+
+        return " ".join(
+            getattr(repository, "url", repository.name)
+            for repository in self.repositories(source)
+        )
+
+    @staticmethod
+    def cache_key(
+        package_name: str,
+        target_package_version: str | None,
+        allow_prereleases: bool | None,
+    ) -> str:
+        """Returns the key of a lookup in the metadata cache"""
+
+        return (
+            f"{package_name} {target_package_version or '*'} "
+            f"allow-prereleases={allow_prereleases}"
+        )
+
+    def is_cached(self, lookup: CandidateLookup) -> bool:
+        """Returns if a lookup is served from the cache without the index"""
+
+        if self.offline:
+            return True
+
+        entry = self.cache.get(
+            self.cache_key(
+                lookup.package_name,
+                lookup.target_package_version,
+                lookup.allow_prereleases,
+            ),
+            self.index_url(lookup.source),
+        )
+
+        return entry is not None and not self.refresh and entry.is_fresh(self.cache.ttl)
+
+    def find_best_candidate(
+        self,
+        package_name: str,
+        target_package_version: str | None = None,
+        allow_prereleases: bool | None = None,
+        source: str | None = None,
+    ) -> Package | None:
+        candidate, _ = self.find_cached_candidate(
+            package_name=package_name,
+            target_package_version=target_package_version,
+            allow_prereleases=allow_prereleases,
+            source=source,
+        )
+
+        return candidate
+
+    def find_cached_candidate(
+        self,
+        package_name: str,
+        target_package_version: str | None = None,
+        allow_prereleases: bool | None = None,
+        source: str | None = None,
+        refresh: bool | None = None,
+    ) -> tuple[Package | None, bool]:
+        """Returns the best candidate and if it was served from the cache
+
+        `refresh` overrides the refresh setting of the selector.
+        """
+
+        if refresh is None:
+            refresh = self.refresh
+
+        key = self.cache_key(package_name, target_package_version, allow_prereleases)
+        index_url = self.index_url(source)
+        entry = self.cache.get(key, index_url)
+
+        if entry is not None and (
+            self.offline or (not refresh and entry.is_fresh(self.cache.ttl))
+        ):
+            if entry.value is None:
+                return None, True
+            return Package(name=package_name, version=entry.value), True
+
+        if self.offline:
+            return None, False
+
+        candidate = super().find_best_candidate(
+            package_name=package_name,
+            target_package_version=target_package_version,
+            allow_prereleases=allow_prereleases,
+            source=source,
+        )
+        self.cache.put(key, index_url, candidate.pretty_version if candidate else None)
+
+        return candidate, False
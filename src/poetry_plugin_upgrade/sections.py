@@ -0,0 +1,252 @@
+import re
+from collections import defaultdict
+from collections.abc import Iterable, MutableMapping, MutableSequence
+from typing import Any
+
+from packaging.utils import NormalizedName, canonicalize_name
+from poetry.core.constraints.version import parse_constraint
+from poetry.core.packages.dependency import Dependency
+from tomlkit.toml_document import TOMLDocument
+
+# name and extras of a PEP 508 requirement, followed by its version specifier
+PEP_508_NAME = re.compile(r"^\s*[A-Za-z0-9][A-Za-z0-9._-]*\s*(\[[^\]]*\])?\s*")
+PEP_440_OPERATORS = ("===", "==", "!=", "~=", ">=", "<=", ">", "<")
+
+SectionKey = tuple[NormalizedName, NormalizedName]
+TableEntry = tuple[MutableMapping[str, Any], str]
+# requirements array, position of the requirement and extra of the array
+ArrayEntry = tuple[MutableSequence[Any], int, NormalizedName | None]
+
+
+def to_pep_440(constraint: str) -> str:
+    """Returns a Poetry version constraint as a PEP 440 version specifier"""
+
+    constraint = constraint.strip()
+
+    if constraint.startswith(PEP_440_OPERATORS):
+        return constraint
+
+    if constraint[0].isdigit():
+        return f"=={constraint}"
+
+    # caret and tilde constraints only exist in Poetry
+    return str(parse_constraint(constraint))
+
+
+def parse_requirement(requirement: str) -> Dependency | None:
+    """Returns the dependency declared by a PEP 508 requirement, if valid"""
+
+    try:
+        return Dependency.create_from_pep_508(requirement)
+    except ValueError:
+        return None
+
+
+def pep_508_specifier(requirement: str) -> str | None:
+    """Returns the version specifier of a PEP 508 requirement
+
+    Parentheses around the specifier are dropped. Returns an empty string for
+    requirements without a specifier, None for invalid or URL requirements.
+    """
+
+    match = PEP_508_NAME.match(requirement)
+    if match is None:
+        return None
+
+    specifier = requirement[match.end() :].partition(";")[0].strip()
+    if specifier.startswith("@"):
+        return None
+
+    return specifier.removeprefix("(").removesuffix(")").strip()
+
+
+def bump_pep_508(requirement: str, new_version: str) -> str | None:
+    """Returns a PEP 508 requirement with its version specifier replaced
+
+    Extras, markers and formatting of the requirement are preserved. Returns
+    None for requirements without a version specifier to replace.
+    """
+
+    match = PEP_508_NAME.match(requirement)
+    if match is None:
+        return None
+
+    head = requirement[: match.end()]
+    specifier, separator, markers = requirement[match.end() :].partition(";")
+    stripped = specifier.strip()
+
+    if not stripped or stripped.startswith("@"):
+        return None
+
+    new_specifier = to_pep_440(new_version)
+    if stripped.startswith("("):
+        new_specifier = f"({new_specifier})"
+
+    trailing = specifier[len(specifier.rstrip()) :]
+
+    return f"{head}{new_specifier}{trailing}{separator}{markers}"
+
+
+class SectionIndex:
+    """Index of the pyproject content entries declaring each dependency
+
+    Maps (group, dependency name) to every table or array entry to mutate, so
+    bumps do not walk the document. Covers Poetry's `dependencies`,
+    `dev-dependencies` and `group.<group>.dependencies` tables as well as
+    PEP 621 `project.dependencies` and `project.optional-dependencies`.
+    """
+
+    def __init__(self, pyproject_content: TOMLDocument) -> None:
+        self._tables: defaultdict[SectionKey, list[TableEntry]] = defaultdict(list)
+        self._arrays: defaultdict[SectionKey, list[ArrayEntry]] = defaultdict(list)
+
+        main = canonicalize_name("main")
+        project: dict[str, Any] = pyproject_content.get("project", {})
+        poetry_content: dict[str, Any] = pyproject_content.get("tool", {}).get(
+            "poetry", {}
+        )
+
+        self._index_table(main, poetry_content.get("dependencies", {}))
+        # take account for the old `dev-dependencies` section
+        self._index_table(
+            canonicalize_name("dev"), poetry_content.get("dev-dependencies", {})
+        )
+        for group, group_content in poetry_content.get("group", {}).items():
+            self._index_table(
+                canonicalize_name(group), group_content.get("dependencies", {})
+            )
+
+        self._index_array(main, project.get("dependencies", []))
+        for extra, requirements in project.get("optional-dependencies", {}).items():
+            self._index_array(main, requirements, extra=canonicalize_name(extra))
+
+    def _index_table(
+        self, group: NormalizedName, section: MutableMapping[str, Any]
+    ) -> None:
+        for name in section:
+            self._tables[(group, canonicalize_name(name))].append((section, name))
+
+    def _index_array(
+        self,
+        group: NormalizedName,
+        requirements: MutableSequence[Any],
+        extra: NormalizedName | None = None,
+    ) -> None:
+        for position, requirement in enumerate(requirements):
+            if not isinstance(requirement, str):
+                continue
+
+            match = PEP_508_NAME.match(requirement)
+            if match is not None:
+                name = canonicalize_name(match.group(0).partition("[")[0].strip())
+                self._arrays[(group, name)].append((requirements, position, extra))
+
+    def bump(self, dependency: Dependency, new_version: str) -> bool:
+        """Bumps every entry of `dependency`, returns if any was modified"""
+
+        bumped = False
+
+        for group in dependency.groups:
+            key = (canonicalize_name(group), dependency.name)
+
+            for section, name in self._tables.get(key, []):
+                if isinstance(section[name], str):
+                    section[name] = new_version
+                    bumped = True
+                elif declares_version(section, name):
+                    section[name]["version"] = new_version
+                    bumped = True
+
+            for requirements, position, _ in self._array_entries(key, dependency):
+                requirement = bump_pep_508(requirements[position], new_version)
+                if requirement is not None:
+                    requirements[position] = requirement
+                    bumped = True
+
+        return bumped
+
+    def declared_constraint(self, dependency: Dependency) -> str | None:
+        """Returns the specifier of the PEP 621 requirement of `dependency`
+
+        Poetry normalizes specifiers, `~=5.0` becomes `>=5.0,<6.0`, bumps of
+        requirements start from their own specifier instead. Returns an empty
+        string for a requirement without a specifier and None for dependencies
+        whose version is declared in a Poetry table.
+        """
+
+        specifiers = set()
+
+        for group in dependency.groups:
+            key = (canonicalize_name(group), dependency.name)
+
+            if any(
+                declares_version(section, name)
+                for section, name in self._tables.get(key, [])
+            ):
+                return None
+
+            for requirements, position, _ in self._array_entries(key, dependency):
+                specifiers.add(pep_508_specifier(requirements[position]))
+
+        return specifiers.pop() if len(specifiers) == 1 else None
+
+    def _array_entries(
+        self, key: SectionKey, dependency: Dependency
+    ) -> list[ArrayEntry]:
+        """Returns the array entry declaring `dependency`
+
+        A package may be required several times, with different markers or in
+        different extras, each requirement being its own dependency. Entries
+        are narrowed down by extra, marker and version constraint until a
+        single one is left. Ambiguous entries are left alone rather than all
+        rewritten to the same constraint.
+        """
+
+        entries = self._arrays.get(key, [])
+        if len(entries) <= 1:
+            return entries
+
+        extras = {canonicalize_name(extra) for extra in dependency.in_extras}
+        marker = str(dependency.marker.without_extras())
+        constraint = str(dependency.constraint)
+
+        def declares(entry: ArrayEntry, criterion: str) -> bool:
+            requirements, position, extra = entry
+            if criterion == "extra":
+                return extra in extras if extras else extra is None
+
+            parsed = parse_requirement(requirements[position])
+            if parsed is None:
+                return False
+            if criterion == "marker":
+                return str(parsed.marker.without_extras()) == marker
+            return str(parsed.constraint) == constraint
+
+        for criterion in ("extra", "marker", "constraint"):
+            entries = [entry for entry in entries if declares(entry, criterion)]
+            if len(entries) <= 1:
+                return entries
+
+        return []
+
+    def apply(self, bumps: Iterable[tuple[Dependency, str]]) -> list[NormalizedName]:
+        """Applies all bumps in one pass
+
+        Returns the names of the bumped dependencies in order, once each.
+        """
+
+        bumped: dict[NormalizedName, None] = {}
+
+        for dependency, new_version in bumps:
+            if self.bump(dependency=dependency, new_version=new_version):
+                bumped[dependency.name] = None
+
+        return list(bumped)
+
+
+def declares_version(section: MutableMapping[str, Any], name: str) -> bool:
+    """Returns if the entry `name` of a Poetry table declares a version"""
+
+    return isinstance(section[name], str) or (
+        isinstance(section[name], MutableMapping) and "version" in section[name]
+    )
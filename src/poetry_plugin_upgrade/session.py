@@ -0,0 +1,72 @@
+from http import HTTPStatus
+
+import requests
+from poetry.repositories import RepositoryPool
+from poetry.repositories.http_repository import HTTPRepository
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = frozenset(
+    {
+        HTTPStatus.TOO_MANY_REQUESTS,
+        HTTPStatus.INTERNAL_SERVER_ERROR,
+        HTTPStatus.BAD_GATEWAY,
+        HTTPStatus.SERVICE_UNAVAILABLE,
+        HTTPStatus.GATEWAY_TIMEOUT,
+    }
+)
+
+
+def create_session(
+    pool_size: int = DEFAULT_POOLSIZE,
+    retries: int = DEFAULT_RETRIES,
+    backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+) -> requests.Session:
+    """Creates a keep-alive HTTP session with a connection pool of `pool_size`
+
+    Requests failing with a 429 or 5xx status are retried up to `retries`
+    times with exponential backoff, waiting for `Retry-After` when the server
+    sends it. The last response is returned once retries are exhausted.
+    """
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+def resize_adapters(session: requests.Session, pool_size: int) -> None:
+    """Resizes the connection pools of the adapters mounted on `session`"""
+
+    for adapter in session.adapters.values():
+        if isinstance(adapter, HTTPAdapter):
+            adapter.init_poolmanager(pool_size, pool_size)
+
+
+def resize_pools(pool: RepositoryPool, pool_size: int) -> None:
+    """Resizes the connection pools of the package indexes of `pool`
+
+    Lookups go through the sessions of Poetry's repositories, their pools are
+    sized to the number of concurrent lookups so connections are reused.
+    """
+
+    for repository in pool.all_repositories:
+        if isinstance(repository, HTTPRepository):
+            resize_adapters(repository.session.get_session(repository.url), pool_size)
@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+
+@dataclass
+class Span:
+    """Timed phase of a run, `start` is relative to the start of the run"""
+
+    name: str
+    start: float
+    duration: float
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class PhaseSummary:
+    """Aggregated spans of a phase"""
+
+    name: str
+    calls: int
+    total: float
+    max: float
+
+
+class Timings:
+    """Thread-safe recorder of the spans of a run
+
+    Phases are recorded with `span`, phases running in worker threads such as
+    candidate lookups can be recorded concurrently.
+    """
+
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[None]:
+        """Records the duration of the enclosed block as a span"""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.spans.append(
+                    Span(
+                        name=name,
+                        start=start - self.origin,
+                        duration=end - start,
+                        attributes=attributes,
+                    )
+                )
+
+    def summary(self) -> list[PhaseSummary]:
+        """Returns spans aggregated per phase, in order of first occurrence"""
+
+        phases: dict[str, PhaseSummary] = {}
+
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+
+        for span in spans:
+            phase = phases.setdefault(
+                span.name, PhaseSummary(name=span.name, calls=0, total=0, max=0)
+            )
+            phase.calls += 1
+            phase.total += span.duration
+            phase.max = max(phase.max, span.duration)
+
+        return list(phases.values())
+
+    def dump(self, path: Path) -> None:
+        """Writes every span and the per phase summary as JSON"""
+
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+
+        path.write_text(
+            json.dumps(
+                {
+                    "spans": [asdict(span) for span in spans],
+                    "phases": [asdict(phase) for phase in self.summary()],
+                },
+                indent=2,
+            )
+        )
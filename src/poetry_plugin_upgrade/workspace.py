@@ -0,0 +1,137 @@
+import os
+import subprocess
+import sys
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+
+from packaging.utils import NormalizedName
+from poetry.poetry import Poetry
+from poetry.repositories import RepositoryPool
+from tomlkit.toml_document import TOMLDocument
+
+from poetry_plugin_upgrade.files import ProjectSnapshot
+
+
+@dataclass
+class WorkspaceProject:
+    """A Poetry project upgraded in workspace mode"""
+
+    poetry: Poetry
+    content: TOMLDocument
+    snapshot: ProjectSnapshot
+    bumped: list[NormalizedName] = field(default_factory=list)
+
+    @property
+    def path(self) -> Path:
+        return self.poetry.file.path
+
+
+@dataclass
+class UpdateResult:
+    """Outcome of the update of a workspace project"""
+
+    project: WorkspaceProject
+    returncode: int
+    output: str
+
+    @property
+    def failed(self) -> bool:
+        return self.returncode != 0
+
+
+def discover_projects(patterns: Iterable[str], root: Path) -> list[Path]:
+    """Returns the pyproject.toml files matching glob `patterns`
+
+    Patterns are relative to `root` and may lead out of it with `..`, patterns
+    matching directories select the pyproject.toml inside them. Raises
+    ValueError for absolute or empty patterns.
+    """
+
+    paths: dict[Path, None] = {}
+
+    for pattern in patterns:
+        if not pattern or Path(pattern).is_absolute():
+            raise ValueError(f"unsupported pattern '{pattern}', use a relative path")
+
+        for match in sorted(root.glob(pattern)):
+            path = match.resolve()
+            if path.is_dir():
+                path /= "pyproject.toml"
+            if path.is_file():
+                paths[path] = None
+
+    return list(paths)
+
+
+def display_path(path: Path, root: Path) -> str:
+    """Returns `path` relative to `root`, even outside of it, for messages"""
+
+    try:
+        return os.path.relpath(path, root.resolve())
+    except ValueError:
+        # paths on different drives have no relative path
+        return str(path)
+
+
+def pool_signature(pool: RepositoryPool) -> tuple[str, ...]:
+    """Returns the names and URLs of the repositories of `pool`
+
+    Projects with the same signature can share a version selector.
+    """
+
+    return tuple(
+        f"{repository.name}={getattr(repository, 'url', '')}"
+        for repository in pool.all_repositories
+    )
+
+
+def update_command(bumped: Sequence[str], no_install: bool) -> list[str]:
+    """Returns the Poetry command updating the bumped dependencies"""
+
+    lock = ["--lock"] if no_install else []
+
+    return [
+        sys.executable,
+        "-m",
+        "poetry",
+        "update",
+        "--no-interaction",
+        *lock,
+        *bumped,
+    ]
+
+
+def run_update(project: WorkspaceProject, no_install: bool) -> UpdateResult:
+    """Updates a project in its own Poetry process, capturing its output"""
+
+    try:
+        process = subprocess.run(  # noqa: S603
+            update_command(project.bumped, no_install=no_install),
+            cwd=project.path.parent,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            check=False,
+        )
+    except OSError as e:
+        return UpdateResult(project=project, returncode=1, output=str(e))
+
+    return UpdateResult(
+        project=project, returncode=process.returncode, output=process.stdout
+    )
+
+
+def run_updates(
+    projects: Sequence[WorkspaceProject], no_install: bool, jobs: int
+) -> list[UpdateResult]:
+    """Runs the update of every project with at most `jobs` running at once
+
+    Solver runs are CPU-bound, so every update runs in its own Poetry process
+    from the project directory. Returns the result of each project in order.
+    """
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(partial(run_update, no_install=no_install), projects))
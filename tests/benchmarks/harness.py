@@ -0,0 +1,169 @@
+import json
+import os
+import time
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from cleo.testers.application_tester import ApplicationTester
+from packaging.utils import NormalizedName
+from poetry.core.constraints.version import VersionConstraint
+from poetry.core.packages.package import Package
+from poetry.factory import Factory
+from poetry.repositories import Repository, RepositoryPool
+
+from tests.helpers import TestApplication
+
+VERSIONS = ("1.0.0", "1.4.2", "2.0.0", "2.3.1")
+DEPENDENCIES_PER_GROUP = 50
+
+
+def dependency_name(index: int) -> str:
+    return f"package-{index:05d}"
+
+
+def constraint(index: int) -> str:
+    """Returns a TOML value cycling through the supported constraint styles"""
+
+    return [
+        '"^1.0.0"',
+        '"~1.0"',
+        '">=1.0.0"',
+        '"==1.0.0"',
+        '"1.0.0"',
+        '"*"',
+        '{ version = "^1.0", extras = ["extra"] }',
+        '">=1.0,<2.0"',
+    ][index % 8]
+
+
+def write_synthetic_project(path: Path, size: int) -> Path:
+    """Writes a pyproject.toml declaring `size` dependencies over many groups"""
+
+    lines = [
+        "[tool.poetry]",
+        f'name = "synthetic-{size}"',
+        'version = "1.0.0"',
+        'description = ""',
+        "authors = []",
+        "",
+        "[tool.poetry.dependencies]",
+        'python = "^3.10"',
+    ]
+
+    for index in range(size):
+        if index and index % DEPENDENCIES_PER_GROUP == 0:
+            group = f"group-{index // DEPENDENCIES_PER_GROUP}"
+            lines += ["", f"[tool.poetry.group.{group}.dependencies]"]
+        lines.append(f"{dependency_name(index)} = {constraint(index)}")
+
+    pyproject_path = path / "pyproject.toml"
+    pyproject_path.write_text("\n".join(lines) + "\n")
+
+    return pyproject_path
+
+
+class IndexedRepository(Repository):
+    """In-memory repository finding packages without scanning all of them
+
+    Poetry's `Repository` scans every package on each lookup, which would make
+    the stub itself dominate runs with thousands of dependencies.
+    """
+
+    def __init__(self, name: str, packages: list[Package]) -> None:
+        self._packages_by_name: defaultdict[NormalizedName, list[Package]] = (
+            defaultdict(list)
+        )
+        super().__init__(name, packages)
+
+    def add_package(self, package: Package) -> None:
+        super().add_package(package)
+        self._packages_by_name[package.name].append(package)
+
+    def _find_packages(
+        self, name: NormalizedName, constraint: VersionConstraint
+    ) -> list[Package]:
+        return [
+            package
+            for package in self._packages_by_name[name]
+            if constraint.allows(package.version)
+        ]
+
+
+def stub_pool(size: int) -> RepositoryPool:
+    """Returns an in-memory pool serving a few versions of every dependency"""
+
+    repository = IndexedRepository(
+        "stub",
+        [
+            Package(dependency_name(index), version)
+            for index in range(size)
+            for version in VERSIONS
+        ],
+    )
+
+    return RepositoryPool([repository])
+
+
+@dataclass
+class BenchmarkResult:
+    """Measurements of an upgrade run"""
+
+    size: int
+    seconds: float
+    peak_memory: int
+    phases: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        """Returns the number of dependencies handled per second"""
+        return self.size / self.seconds
+
+
+def run_upgrade(pyproject_path: Path, size: int, args: str) -> ApplicationTester:
+    poetry = Factory().create_poetry(pyproject_path)
+    poetry.set_pool(stub_pool(size))
+    tester = ApplicationTester(TestApplication(poetry))
+
+    assert tester.execute(args) == 0, tester.io.fetch_error()
+
+    return tester
+
+
+def benchmark_upgrade(path: Path, size: int) -> BenchmarkResult:
+    """Runs `upgrade --latest --dry-run` on a synthetic project of `size`
+
+    The run is timed once, then repeated with tracemalloc to measure peak
+    memory without slowing down the timed run. Both runs start with an empty
+    metadata cache.
+    """
+
+    pyproject_path = write_synthetic_project(path, size)
+    timings_path = path / "timings.json"
+
+    os.environ["POETRY_CACHE_DIR"] = str(path / "timed-cache")
+    start = time.perf_counter()
+    run_upgrade(
+        pyproject_path,
+        size,
+        f"upgrade --latest --dry-run --timings-json {timings_path}",
+    )
+    seconds = time.perf_counter() - start
+
+    os.environ["POETRY_CACHE_DIR"] = str(path / "traced-cache")
+    tracemalloc.start()
+    try:
+        run_upgrade(pyproject_path, size, "upgrade --latest --dry-run")
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    phases = json.loads(timings_path.read_text())["phases"]
+
+    return BenchmarkResult(
+        size=size,
+        seconds=seconds,
+        peak_memory=peak_memory,
+        phases={phase["name"]: phase["total"] for phase in phases},
+    )
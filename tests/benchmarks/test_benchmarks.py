@@ -0,0 +1,45 @@
+import json
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+
+from tests.benchmarks.harness import benchmark_upgrade
+
+BASELINES_PATH = Path(__file__).parent / "baselines.json"
+# measurements slower or larger than the baseline by this factor fail
+TOLERANCE = 2.0
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.mark.parametrize("size", [100, 1_000, 10_000])
+def test_upgrade_dry_run(
+    size: int,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    request: pytest.FixtureRequest,
+) -> None:
+    # run against the current interpreter instead of creating a virtualenv
+    monkeypatch.setenv("POETRY_VIRTUALENVS_CREATE", "false")
+    monkeypatch.setenv("POETRY_CACHE_DIR", str(tmp_path))
+
+    result = benchmark_upgrade(tmp_path, size)
+
+    phases = ", ".join(f"{name} {total:.3f}s" for name, total in result.phases.items())
+    print(
+        f"\n{size} dependencies: {result.seconds:.3f}s, "
+        f"{result.throughput:.0f} dependencies/s, "
+        f"peak memory {result.peak_memory / 1024 / 1024:.1f} MiB\n{phases}"
+    )
+
+    baselines = json.loads(BASELINES_PATH.read_text())
+
+    if request.config.getoption("--benchmark-save"):
+        baselines[str(size)] = asdict(result)
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=2) + "\n")
+        return
+
+    baseline = baselines[str(size)]
+    assert result.seconds <= baseline["seconds"] * TOLERANCE
+    assert result.peak_memory <= baseline["peak_memory"] * TOLERANCE
@@ -1,3 +1,4 @@
+from collections.abc import Iterator
 from pathlib import Path
 
 import pytest
@@ -10,6 +11,45 @@ from poetry.pyproject.toml import PyProjectTOML
 from tomlkit.toml_document import TOMLDocument
 
 from tests.helpers import TestApplication, TestUpgradeCommand
+from tests.index_server import IndexServer
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--benchmark", action="store_true", help="Run the benchmark suite."
+    )
+    parser.addoption(
+        "--benchmark-save",
+        action="store_true",
+        help="Store benchmark results as the new baselines.",
+    )
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config, items: list[pytest.Item]
+) -> None:
+    if config.getoption("--benchmark") or config.getoption("--benchmark-save"):
+        return
+
+    skip = pytest.mark.skip(reason="benchmarks only run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache_dir(
+    tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("POETRY_CACHE_DIR", str(tmp_path_factory.mktemp("cache")))
+
+
+@pytest.fixture()
+def index_server() -> Iterator[IndexServer]:
+    path = Path(__file__).parent / "fixtures" / "index_manifest.json"
+
+    with IndexServer.from_manifest(path) as server:
+        yield server
 
 
 @pytest.fixture()
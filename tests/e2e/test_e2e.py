@@ -1,10 +1,22 @@
+import json
 from pathlib import Path
 
+import pytest
 from cleo.testers.application_tester import ApplicationTester
 from poetry.core.packages.package import Package
+from poetry.factory import Factory
 from poetry.pyproject.toml import PyProjectTOML
 from pytest_mock import MockerFixture
 
+from poetry_plugin_upgrade.incremental import STATE_FILE, Probe
+from poetry_plugin_upgrade.workspace import UpdateResult
+from tests.helpers import TestApplication
+
+BUMPED = "foo bar baz corge grault plugh xyzzy foobaz foo-corge"
+BUMPED_WITH_LATEST = (
+    "foo bar baz corge grault plugh xyzzy thud foobaz fooqux fooquux foo-corge"
+)
+
 
 def test_command(
     app_tester: ApplicationTester,
@@ -31,7 +43,7 @@ def test_command(
 
     assert app_tester.execute("upgrade") == 0
     assert PyProjectTOML(tmp_pyproject_path).file.read() == expected
-    command_call.assert_called_once_with(name="update")
+    command_call.assert_called_once_with(name="update", args=BUMPED)
 
 
 def test_command_with_latest(
@@ -59,7 +71,7 @@ def test_command_with_latest(
 
     assert app_tester.execute("upgrade --latest") == 0
     assert PyProjectTOML(tmp_pyproject_path).file.read() == expected
-    command_call.assert_called_once_with(name="update")
+    command_call.assert_called_once_with(name="update", args=BUMPED_WITH_LATEST)
 
 
 def test_command_with_dry_run(
@@ -114,7 +126,7 @@ def test_command_with_no_install(
 
     assert app_tester.execute("upgrade --no-install") == 0
     assert PyProjectTOML(tmp_pyproject_path).file.read() == expected
-    command_call.assert_called_once_with(name="lock", args="--no-update")
+    command_call.assert_called_once_with(name="update", args=f"--lock {BUMPED}")
 
 
 def test_command_reverts_pyproject_on_error(
@@ -140,7 +152,7 @@ def test_command_reverts_pyproject_on_error(
 
     assert app_tester.execute("upgrade") == 1
     assert PyProjectTOML(tmp_pyproject_path).file.read() == expected
-    command_call.assert_called_once_with(name="update")
+    command_call.assert_called_once_with(name="update", args=BUMPED)
 
 
 def test_pinned_without_latest_fails(app_tester: ApplicationTester) -> None:
@@ -174,7 +186,9 @@ def test_command_with_exclude(
         app_tester.execute("upgrade --exclude foo --exclude bar --exclude=grault") == 0
     )
     assert PyProjectTOML(tmp_pyproject_path).file.read() == expected
-    command_call.assert_called_once_with(name="update")
+    command_call.assert_called_once_with(
+        name="update", args="baz corge plugh xyzzy foobaz foo-corge"
+    )
 
 
 def test_command_preserve_wildcard(
@@ -202,10 +216,875 @@ def test_command_preserve_wildcard(
 
     assert app_tester.execute("upgrade --latest --preserve-wildcard") == 0
     assert PyProjectTOML(tmp_pyproject_path).file.read() == expected
-    command_call.assert_called_once_with(name="update")
+    command_call.assert_called_once_with(
+        name="update", args=BUMPED_WITH_LATEST.replace(" fooquux", "")
+    )
 
 
 def test_preserve_wildcard_without_latest_fails(
     app_tester: ApplicationTester,
 ) -> None:
     assert app_tester.execute("upgrade --preserve-wildcard") == 1
+
+
+def test_command_with_jobs(
+    app_tester: ApplicationTester,
+    packages: list[Package],
+    mocker: MockerFixture,
+    project_path: Path,
+    tmp_pyproject_path: Path,
+) -> None:
+    command_call = mocker.patch(
+        "poetry.console.commands.command.Command.call",
+        return_value=0,
+    )
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=packages,
+    )
+    mocker.patch(
+        "poetry.console.commands.installer_command.InstallerCommand.reset_poetry",
+        return_value=None,
+    )
+
+    path = project_path / "expected_pyproject.toml"
+    expected = PyProjectTOML(path).file.read()
+
+    assert app_tester.execute("upgrade --jobs 4") == 0
+    assert PyProjectTOML(tmp_pyproject_path).file.read() == expected
+    command_call.assert_called_once_with(name="update", args=BUMPED)
+
+
+def test_invalid_jobs_fails(app_tester: ApplicationTester) -> None:
+    assert app_tester.execute("upgrade --jobs 0") == 1
+
+
+def test_command_deduplicates_lookups_across_groups(
+    mocker: MockerFixture,
+    tmp_path: Path,
+) -> None:
+    pyproject_path = tmp_path / "pyproject.toml"
+    pyproject_path.write_text(
+        """\
+[tool.poetry]
+name = "shared-project"
+version = "1.0.0"
+description = ""
+authors = []
+
+[tool.poetry.dependencies]
+python = "^3.10"
+requests = "^2.0.0"
+
+[tool.poetry.group.dev.dependencies]
+pytest = "^7.0.0"
+
+[tool.poetry.group.test.dependencies]
+pytest = "^7.0.0"
+
+[tool.poetry.group.docs.dependencies]
+requests = "^2.0.0"
+"""
+    )
+    app_tester = ApplicationTester(
+        TestApplication(Factory().create_poetry(pyproject_path))
+    )
+    mocker.patch(
+        "poetry.console.commands.command.Command.call",
+        return_value=0,
+    )
+    find_best_candidate = mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=lambda package_name, **_: Package(
+            name=package_name, version="9.0.0"
+        ),
+    )
+    mocker.patch(
+        "poetry.console.commands.installer_command.InstallerCommand.reset_poetry",
+        return_value=None,
+    )
+
+    assert app_tester.execute("upgrade --latest --with test,docs") == 0
+
+    content = PyProjectTOML(pyproject_path).file.read()["tool"]["poetry"]
+    assert find_best_candidate.call_count == 2
+    assert "skipped 2 duplicate lookups" in app_tester.io.fetch_output()
+    assert content["dependencies"]["requests"] == "^9.0.0"
+    assert content["group"]["dev"]["dependencies"]["pytest"] == "^9.0.0"
+    assert content["group"]["test"]["dependencies"]["pytest"] == "^9.0.0"
+    assert content["group"]["docs"]["dependencies"]["requests"] == "^9.0.0"
+
+
+def test_command_bumps_pep_621_requirements_from_their_specifier(
+    mocker: MockerFixture,
+    tmp_path: Path,
+) -> None:
+    pyproject_path = tmp_path / "pyproject.toml"
+    pyproject_path.write_text(
+        """\
+[project]
+name = "pep-621-project"
+version = "1.0.0"
+requires-python = ">=3.10"
+dependencies = ["sphinx~=5.0", "baz ~= 1.4.2", "attrs"]
+"""
+    )
+    app_tester = ApplicationTester(
+        TestApplication(Factory().create_poetry(pyproject_path))
+    )
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=lambda package_name, **_: Package(
+            name=package_name, version={"baz": "7.3.1"}.get(package_name, "7.3.0")
+        ),
+    )
+
+    assert app_tester.execute("upgrade --latest --dry-run --format json") == 0
+
+    records = {
+        record["name"]: record for record in json.loads(app_tester.io.fetch_output())
+    }
+    assert records["sphinx"]["old_constraint"] == "~=5.0"
+    assert records["sphinx"]["new_constraint"] == "~=7.3"
+    assert records["baz"]["new_constraint"] == "~= 7.3.1"
+    assert records["attrs"]["skip_reason"] == "unconstrained"
+    assert records["attrs"]["new_constraint"] is None
+
+    mocker.patch("poetry.console.commands.command.Command.call", return_value=0)
+    mocker.patch(
+        "poetry.console.commands.installer_command.InstallerCommand.reset_poetry",
+        return_value=None,
+    )
+
+    assert app_tester.execute("upgrade --latest") == 0
+
+    content = PyProjectTOML(pyproject_path).file.read()
+    assert content["project"]["dependencies"] == [
+        "sphinx~=7.3",
+        "baz ~= 7.3.1",
+        "attrs",
+    ]
+
+
+def test_command_skips_update_when_nothing_bumped(
+    app_tester: ApplicationTester,
+    packages: list[Package],
+    mocker: MockerFixture,
+    tmp_pyproject_path: Path,
+) -> None:
+    command_call = mocker.patch(
+        "poetry.console.commands.command.Command.call",
+        return_value=0,
+    )
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=[
+            Package(name=package.name, version="1.1.1") for package in packages
+        ],
+    )
+    reset_poetry = mocker.patch(
+        "poetry.console.commands.installer_command.InstallerCommand.reset_poetry",
+        return_value=None,
+    )
+
+    expected = tmp_pyproject_path.read_text()
+
+    assert app_tester.execute("upgrade") == 0
+    assert tmp_pyproject_path.read_text() == expected
+    assert "already up to date" in app_tester.io.fetch_output()
+    command_call.assert_not_called()
+    reset_poetry.assert_not_called()
+
+
+def test_command_reverts_lock_file_on_error(
+    app_tester: ApplicationTester,
+    packages: list[Package],
+    mocker: MockerFixture,
+    tmp_pyproject_path: Path,
+) -> None:
+    lock_path = tmp_pyproject_path.parent / "poetry.lock"
+    lock_path.write_text("# original lock\n")
+
+    def update(**_: object) -> int:
+        lock_path.write_text("# half written lock\n")
+        raise Exception
+
+    mocker.patch(
+        "poetry.console.commands.command.Command.call",
+        side_effect=update,
+    )
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=packages,
+    )
+    mocker.patch(
+        "poetry.console.commands.installer_command.InstallerCommand.reset_poetry",
+        return_value=None,
+    )
+
+    expected = tmp_pyproject_path.read_bytes()
+
+    assert app_tester.execute("upgrade") == 1
+    assert tmp_pyproject_path.read_bytes() == expected
+    assert lock_path.read_text() == "# original lock\n"
+
+
+def test_invalid_exclude_pattern_fails(app_tester: ApplicationTester) -> None:
+    assert app_tester.execute("upgrade --exclude 're:('") == 1
+    assert "Invalid '--exclude': invalid pattern 're:('" in app_tester.io.fetch_error()
+
+
+def test_command_with_exclude_patterns(
+    app_tester: ApplicationTester,
+    packages: list[Package],
+    mocker: MockerFixture,
+) -> None:
+    command_call = mocker.patch(
+        "poetry.console.commands.command.Command.call",
+        return_value=0,
+    )
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=packages,
+    )
+    mocker.patch(
+        "poetry.console.commands.installer_command.InstallerCommand.reset_poetry",
+        return_value=None,
+    )
+
+    assert app_tester.execute("upgrade --exclude 'foo*' --exclude 're:^b'") == 0
+    command_call.assert_called_once_with(name="update", args="corge grault plugh xyzzy")
+
+
+def write_project(path: Path, name: str, dependencies: str) -> Path:
+    path.mkdir(parents=True, exist_ok=True)
+    pyproject_path = path / "pyproject.toml"
+    pyproject_path.write_text(
+        f"""\
+[tool.poetry]
+name = "{name}"
+version = "1.0.0"
+description = ""
+authors = []
+
+[tool.poetry.dependencies]
+python = "^3.10"
+{dependencies}
+"""
+    )
+
+    return pyproject_path
+
+
+@pytest.fixture()
+def workspace_path(tmp_path: Path) -> Path:
+    write_project(tmp_path, "workspace", "")
+    write_project(
+        tmp_path / "services" / "a",
+        "service-a",
+        'requests = "^2.0.0"\npytest = "^7.0.0"',
+    )
+    write_project(tmp_path / "services" / "b", "service-b", 'requests = "^2.1.0"')
+
+    return tmp_path
+
+
+def test_command_with_projects(
+    mocker: MockerFixture,
+    workspace_path: Path,
+) -> None:
+    app_tester = ApplicationTester(
+        TestApplication(Factory().create_poetry(workspace_path))
+    )
+    find_best_candidate = mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=lambda package_name, **_: Package(
+            name=package_name, version="2.5.0"
+        ),
+    )
+    run_update = mocker.patch(
+        "poetry_plugin_upgrade.workspace.run_update",
+        side_effect=lambda project, **_: UpdateResult(
+            project=project, returncode=0, output="Writing lock file"
+        ),
+    )
+
+    assert (
+        app_tester.execute("upgrade --latest --projects 'services/*' --lock-jobs 2")
+        == 0
+    )
+
+    service_a = PyProjectTOML(workspace_path / "services" / "a" / "pyproject.toml")
+    service_b = PyProjectTOML(workspace_path / "services" / "b" / "pyproject.toml")
+    assert service_a.file.read()["tool"]["poetry"]["dependencies"] == {
+        "python": "^3.10",
+        "requests": "^2.5.0",
+        "pytest": "^2.5.0",
+    }
+    assert service_b.file.read()["tool"]["poetry"]["dependencies"] == {
+        "python": "^3.10",
+        "requests": "^2.5.0",
+    }
+    # requests is shared by both projects and only looked up once
+    assert find_best_candidate.call_count == 2
+    projects = sorted(
+        (call.args[0] for call in run_update.call_args_list),
+        key=lambda project: project.path,
+    )
+    assert [project.path.parent for project in projects] == [
+        workspace_path / "services" / "a",
+        workspace_path / "services" / "b",
+    ]
+    assert [project.bumped for project in projects] == [
+        ["requests", "pytest"],
+        ["requests"],
+    ]
+
+
+def test_command_with_projects_and_dry_run(
+    mocker: MockerFixture,
+    workspace_path: Path,
+) -> None:
+    app_tester = ApplicationTester(
+        TestApplication(Factory().create_poetry(workspace_path))
+    )
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=lambda package_name, **_: Package(
+            name=package_name, version="2.5.0"
+        ),
+    )
+    run_updates = mocker.patch("poetry_plugin_upgrade.command.run_updates")
+
+    expected = (workspace_path / "services" / "a" / "pyproject.toml").read_text()
+
+    assert app_tester.execute("upgrade --projects 'services/*' --dry-run") == 0
+
+    output = app_tester.io.fetch_output()
+    assert "services/a/pyproject.toml" in output
+    assert "services/b/pyproject.toml" in output
+    assert 'requests = "^2.5.0"' in output
+    assert (workspace_path / "services" / "a" / "pyproject.toml").read_text() == (
+        expected
+    )
+    run_updates.assert_not_called()
+
+
+def test_command_with_projects_reports_failed_updates(
+    mocker: MockerFixture,
+    workspace_path: Path,
+) -> None:
+    app_tester = ApplicationTester(
+        TestApplication(Factory().create_poetry(workspace_path))
+    )
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=lambda package_name, **_: Package(
+            name=package_name, version="2.5.0"
+        ),
+    )
+    mocker.patch(
+        "poetry_plugin_upgrade.workspace.run_update",
+        side_effect=lambda project, **_: UpdateResult(
+            project=project,
+            returncode=int(project.path.parent.name == "b"),
+            output="Because service-b depends on requests (^2.5.0) ...",
+        ),
+    )
+
+    service_a = workspace_path / "services" / "a" / "pyproject.toml"
+    service_b = workspace_path / "services" / "b" / "pyproject.toml"
+    lock_path = service_b.parent / "poetry.lock"
+    lock_path.write_text("# original lock\n")
+    expected = service_b.read_bytes()
+
+    assert app_tester.execute("upgrade --projects 'services/*'") == 1
+    assert "Updating services/b/pyproject.toml failed" in (app_tester.io.fetch_error())
+    output = app_tester.io.fetch_output()
+    assert "Because service-b depends on requests" in output
+    assert "Updated 1 projects, 1 failed" in output
+    # only the failed project is reverted
+    assert service_b.read_bytes() == expected
+    assert lock_path.read_text() == "# original lock\n"
+    assert 'requests = "^2.5.0"' in service_a.read_text()
+
+
+def test_command_with_projects_outside_of_root(
+    mocker: MockerFixture,
+    tmp_path: Path,
+) -> None:
+    root = tmp_path / "root"
+    write_project(root, "workspace", "")
+    service_a = write_project(tmp_path / "svc-a", "service-a", 'requests = "^2.0.0"')
+    service_b = write_project(tmp_path / "svc-b", "service-b", 'requests = "^2.1.0"')
+    app_tester = ApplicationTester(TestApplication(Factory().create_poetry(root)))
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=lambda package_name, **_: Package(
+            name=package_name, version="2.5.0"
+        ),
+    )
+    mocker.patch(
+        "poetry_plugin_upgrade.workspace.run_update",
+        side_effect=lambda project, **_: UpdateResult(
+            project=project,
+            returncode=int(project.path.parent.name == "svc-b"),
+            output="Because service-b depends on requests (^2.5.0) ...",
+        ),
+    )
+    expected = service_b.read_bytes()
+
+    assert app_tester.execute("upgrade --projects '../svc-*' --dry-run") == 0
+    assert "../svc-a/pyproject.toml" in app_tester.io.fetch_output()
+
+    assert app_tester.execute("upgrade --projects '../svc-*'") == 1
+    assert "Updating ../svc-b/pyproject.toml failed" in app_tester.io.fetch_error()
+    assert service_b.read_bytes() == expected
+    assert 'requests = "^2.5.0"' in service_a.read_text()
+
+
+def test_command_with_absolute_projects_fails(workspace_path: Path) -> None:
+    app_tester = ApplicationTester(
+        TestApplication(Factory().create_poetry(workspace_path))
+    )
+
+    assert app_tester.execute(f"upgrade --projects '{workspace_path}/services/*'") == 1
+    assert "Invalid '--projects': unsupported pattern" in app_tester.io.fetch_error()
+
+
+def test_invalid_lock_jobs_fails(workspace_path: Path) -> None:
+    app_tester = ApplicationTester(
+        TestApplication(Factory().create_poetry(workspace_path))
+    )
+
+    assert app_tester.execute("upgrade --projects 'services/*' --lock-jobs 0") == 1
+
+
+def test_command_with_unmatched_projects_fails(workspace_path: Path) -> None:
+    app_tester = ApplicationTester(
+        TestApplication(Factory().create_poetry(workspace_path))
+    )
+
+    assert app_tester.execute("upgrade --projects 'missing/*'") == 1
+
+
+def test_command_with_timings(
+    app_tester: ApplicationTester,
+    packages: list[Package],
+    mocker: MockerFixture,
+    tmp_path: Path,
+) -> None:
+    mocker.patch(
+        "poetry.console.commands.command.Command.call",
+        return_value=0,
+    )
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=packages,
+    )
+    mocker.patch(
+        "poetry.console.commands.installer_command.InstallerCommand.reset_poetry",
+        return_value=None,
+    )
+    timings_path = tmp_path / "timings.json"
+
+    assert app_tester.execute(f"upgrade --timings --timings-json {timings_path}") == 0
+
+    output = app_tester.io.fetch_output()
+    phases = [
+        "read",
+        "get_groups",
+        "find_best_candidate",
+        "mutate",
+        "write",
+        "reset_poetry",
+        "update",
+    ]
+    assert all(phase in output for phase in phases)
+    content = json.loads(timings_path.read_text())
+    assert [phase["name"] for phase in content["phases"]] == phases
+    assert {
+        span["attributes"]["package"]
+        for span in content["spans"]
+        if span["name"] == "find_best_candidate"
+    } >= {"foo", "bar"}
+
+
+def test_command_streams_progress(
+    app_tester: ApplicationTester,
+    packages: list[Package],
+    mocker: MockerFixture,
+) -> None:
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=packages,
+    )
+
+    assert app_tester.execute("upgrade --dry-run --jobs 1") == 0
+
+    lines = [
+        line
+        for line in app_tester.io.fetch_error().splitlines()
+        if line.startswith("[")
+    ]
+    assert lines[0].startswith("[1/")
+    assert "foo: ^1.1.1 → ^2.2.2 (" in lines[0]
+    assert lines[0].endswith(" ms, cache miss)")
+    # the TOML dump on the output is not interleaved with progress
+    assert "[1/" not in app_tester.io.fetch_output()
+
+
+def test_command_reports_missing_candidates_once(
+    app_tester: ApplicationTester, mocker: MockerFixture
+) -> None:
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        return_value=None,
+    )
+
+    assert app_tester.execute("upgrade --dry-run --jobs 1") == 0
+
+    output = app_tester.io.fetch_output() + app_tester.io.fetch_error()
+    assert "foo: ^1.1.1 → no candidate (" in output
+    assert "No new version" not in output
+
+
+def test_command_with_ndjson_format(
+    app_tester: ApplicationTester,
+    packages: list[Package],
+    mocker: MockerFixture,
+) -> None:
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=packages,
+    )
+
+    assert app_tester.execute("upgrade --dry-run --format ndjson --jobs 1") == 0
+
+    records = [json.loads(line) for line in app_tester.io.fetch_output().splitlines()]
+    by_name = {(record["group"], record["name"]): record for record in records}
+    assert by_name[("main", "foo")] == {
+        "group": "main",
+        "name": "foo",
+        "old_constraint": "^1.1.1",
+        "new_constraint": "^2.2.2",
+        "candidate": "2.2.2",
+        "skip_reason": None,
+    }
+    assert by_name[("main", "waldo")]["skip_reason"] == "git source"
+    assert by_name[("dev", "fred")]["skip_reason"] == "pinned"
+
+
+def test_command_with_json_format(
+    app_tester: ApplicationTester,
+    packages: list[Package],
+    mocker: MockerFixture,
+) -> None:
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=packages,
+    )
+
+    assert app_tester.execute("upgrade --dry-run --format json") == 0
+
+    records = json.loads(app_tester.io.fetch_output())
+    assert {record["name"] for record in records if record["new_constraint"]} == (
+        set(BUMPED.split())
+    )
+
+
+@pytest.mark.parametrize("output_format", ["json", "ndjson"])
+def test_command_with_format_and_timings(
+    app_tester: ApplicationTester,
+    packages: list[Package],
+    mocker: MockerFixture,
+    output_format: str,
+) -> None:
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=packages,
+    )
+
+    assert (
+        app_tester.execute(f"upgrade --dry-run --format {output_format} --timings") == 0
+    )
+
+    output = app_tester.io.fetch_output()
+    records = (
+        json.loads(output)
+        if output_format == "json"
+        else [json.loads(line) for line in output.splitlines()]
+    )
+    assert {record["name"] for record in records if record["new_constraint"]} == (
+        set(BUMPED.split())
+    )
+    assert "find_best_candidate" in app_tester.io.fetch_error()
+
+
+def test_invalid_format_fails(app_tester: ApplicationTester) -> None:
+    assert app_tester.execute("upgrade --format yaml") == 1
+
+
+@pytest.mark.parametrize("output_format", ["json", "ndjson"])
+def test_format_without_dry_run_fails(
+    app_tester: ApplicationTester,
+    mocker: MockerFixture,
+    tmp_pyproject_path: Path,
+    output_format: str,
+) -> None:
+    command_call = mocker.patch("poetry.console.commands.command.Command.call")
+    content = tmp_pyproject_path.read_bytes()
+
+    assert app_tester.execute(f"upgrade --format {output_format}") == 1
+
+    command_call.assert_not_called()
+    assert tmp_pyproject_path.read_bytes() == content
+    assert app_tester.io.fetch_output() == ""
+    assert "'--format' specified without '--dry-run'" in app_tester.io.fetch_error()
+
+
+def test_command_with_plan_out_and_apply(
+    app_tester: ApplicationTester,
+    packages: list[Package],
+    mocker: MockerFixture,
+    project_path: Path,
+    tmp_pyproject_path: Path,
+) -> None:
+    command_call = mocker.patch(
+        "poetry.console.commands.command.Command.call",
+        return_value=0,
+    )
+    find_best_candidate = mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=packages,
+    )
+    mocker.patch(
+        "poetry.console.commands.installer_command.InstallerCommand.reset_poetry",
+        return_value=None,
+    )
+
+    plan_path = tmp_pyproject_path.parent / "plan.json"
+    original = PyProjectTOML(tmp_pyproject_path).file.read()
+
+    assert app_tester.execute(f"upgrade --latest --plan-out {plan_path}") == 0
+    # the project is not modified
+    assert PyProjectTOML(tmp_pyproject_path).file.read() == original
+    command_call.assert_not_called()
+
+    plan = json.loads(plan_path.read_text())
+    assert plan["latest"] is True
+    assert {
+        record["name"] for record in plan["records"] if record["new_constraint"]
+    } == set(BUMPED_WITH_LATEST.split())
+
+    find_best_candidate.reset_mock()
+    expected = PyProjectTOML(
+        project_path / "expected_pyproject_with_latest.toml"
+    ).file.read()
+
+    assert app_tester.execute(f"upgrade --apply {plan_path}") == 0
+    assert PyProjectTOML(tmp_pyproject_path).file.read() == expected
+    find_best_candidate.assert_not_called()
+    command_call.assert_called_once_with(name="update", args=BUMPED_WITH_LATEST)
+
+
+def test_command_apply_skips_candidates_not_allowed(
+    app_tester: ApplicationTester,
+    mocker: MockerFixture,
+    tmp_pyproject_path: Path,
+) -> None:
+    command_call = mocker.patch(
+        "poetry.console.commands.command.Command.call",
+        return_value=0,
+    )
+    mocker.patch(
+        "poetry.console.commands.installer_command.InstallerCommand.reset_poetry",
+        return_value=None,
+    )
+
+    plan_path = tmp_pyproject_path.parent / "plan.json"
+    plan_path.write_text(
+        json.dumps(
+            {
+                "version": 1,
+                "latest": False,
+                "records": [
+                    {
+                        "group": "main",
+                        "name": "foo",
+                        "old_constraint": "^1.0",
+                        "candidate": "1.5.0",
+                    },
+                    {
+                        "group": "main",
+                        "name": "bar",
+                        "old_constraint": "^2.0",
+                        "candidate": "2.2.2",
+                    },
+                ],
+            }
+        )
+    )
+
+    assert app_tester.execute(f"upgrade --apply {plan_path}") == 0
+    content = PyProjectTOML(tmp_pyproject_path).file.read()
+    assert content["tool"]["poetry"]["dependencies"]["foo"] == "^1.5.0"
+    assert content["tool"]["poetry"]["dependencies"]["bar"] == "^1.1.1"
+    assert "Skipping 'bar', 2.2.2 is not allowed by ^1.1.1" in (
+        app_tester.io.fetch_error()
+    )
+    command_call.assert_called_once_with(name="update", args="foo")
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        "--apply plan.json --latest",
+        "--apply plan.json --plan-out other.json",
+        "--apply missing.json",
+        "--plan-out plan.json --projects '*'",
+    ],
+)
+def test_invalid_plan_options_fail(app_tester: ApplicationTester, options: str) -> None:
+    assert app_tester.execute(f"upgrade {options}") == 1
+
+
+def test_command_with_incremental(
+    app_tester: ApplicationTester,
+    packages: list[Package],
+    mocker: MockerFixture,
+    tmp_pyproject_path: Path,
+) -> None:
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=packages,
+    )
+    probe = mocker.patch(
+        "poetry_plugin_upgrade.incremental.probe",
+        return_value=Probe(changed=True, serial=1, etag='"foo-1"'),
+    )
+
+    assert app_tester.execute("upgrade --incremental --dry-run --latest") == 0
+
+    state = json.loads((tmp_pyproject_path.parent / STATE_FILE).read_text())
+    assert state["lookups"]["foo * allow-prereleases=None"] == {
+        "index_url": "https://pypi.org/simple/",
+        "candidate": "2.2.2",
+        "serial": 1,
+        "etag": '"foo-1"',
+    }
+    assert probe.call_count == len(state["lookups"])
+
+
+@pytest.mark.parametrize("option", ["--offline", "--apply {plan}"])
+def test_incremental_with_incompatible_option_fails(
+    app_tester: ApplicationTester, option: str, tmp_path: Path
+) -> None:
+    plan = tmp_path / "plan.json"
+    plan.write_text(json.dumps({"version": 1, "latest": False, "records": []}))
+
+    assert app_tester.execute(f"upgrade --incremental {option.format(plan=plan)}") == 1
+    assert "'--incremental' specified with" in app_tester.io.fetch_error()
+
+
+def test_command_with_prefetch(
+    app_tester: ApplicationTester,
+    packages: list[Package],
+    mocker: MockerFixture,
+) -> None:
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=packages,
+    )
+    prefetch_pages = mocker.patch("poetry_plugin_upgrade.command.prefetch_pages")
+
+    assert app_tester.execute("upgrade --prefetch --dry-run --latest") == 0
+
+    (sources,), _ = prefetch_pages.call_args
+    assert [source.repository.name for source in sources] == ["PyPI"]
+    assert set(BUMPED_WITH_LATEST.split()) <= set(sources[0].names)
+    assert "Prefetched" in app_tester.io.fetch_output()
+
+
+def test_command_with_source_limits(
+    packages: list[Package], mocker: MockerFixture, tmp_path: Path
+) -> None:
+    pyproject_path = write_project(tmp_path, "limited", 'foo = "^1.0.0"')
+    with pyproject_path.open("a") as f:
+        f.write(
+            "\n[tool.poetry-plugin-upgrade.sources.PyPI]\n"
+            "max-in-flight = 8\n"
+            "rate-limit = 50\n"
+            "\n[tool.poetry-plugin-upgrade.sources.private]\n"
+            "max-in-flight = 2\n"
+        )
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=packages,
+    )
+    poetry = Factory().create_poetry(tmp_path)
+    app_tester = ApplicationTester(TestApplication(poetry))
+
+    assert app_tester.execute("upgrade --dry-run") == 0
+    assert "Limits of unknown source 'private' ignored" in app_tester.io.fetch_error()
+    # requests to PyPI go through its limiter
+    assert "request" in vars(poetry.pool.repository("PyPI").session)
+
+
+def test_invalid_source_limits_fail(tmp_path: Path) -> None:
+    pyproject_path = write_project(tmp_path, "limited", "")
+    with pyproject_path.open("a") as f:
+        f.write("\n[tool.poetry-plugin-upgrade.sources.PyPI]\nmax-in-flight = 0\n")
+    app_tester = ApplicationTester(TestApplication(Factory().create_poetry(tmp_path)))
+
+    assert app_tester.execute("upgrade") == 1
+    assert "Invalid source limits" in app_tester.io.fetch_error()
+
+
+def test_command_with_on_error_skip(
+    app_tester: ApplicationTester, mocker: MockerFixture
+) -> None:
+    def find_best_candidate(package_name: str, **_: object) -> Package:
+        if package_name == "bar":
+            raise ConnectionError("read timed out")
+        return Package(name=package_name, version="2.2.2")
+
+    command_call = mocker.patch(
+        "poetry.console.commands.command.Command.call",
+        return_value=0,
+    )
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=find_best_candidate,
+    )
+    mocker.patch(
+        "poetry.console.commands.installer_command.InstallerCommand.reset_poetry",
+        return_value=None,
+    )
+
+    assert app_tester.execute("upgrade --on-error skip") == 0
+
+    # the other bumps are still applied
+    bumped = BUMPED.replace(" bar", "")
+    command_call.assert_called_once_with(name="update", args=bumped)
+    error = app_tester.io.fetch_error()
+    assert "Skipped 1 packages whose lookup failed" in error
+    assert "bar: read timed out" in error
+
+
+def test_command_with_on_error_abort(
+    app_tester: ApplicationTester, mocker: MockerFixture
+) -> None:
+    command_call = mocker.patch("poetry.console.commands.command.Command.call")
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        side_effect=ConnectionError("read timed out"),
+    )
+
+    assert app_tester.execute("upgrade") == 1
+    command_call.assert_not_called()
+
+
+def test_invalid_on_error_fails(app_tester: ApplicationTester) -> None:
+    assert app_tester.execute("upgrade --on-error ignore") == 1
+    assert "Invalid on-error 'ignore'" in app_tester.io.fetch_error()
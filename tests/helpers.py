@@ -20,3 +20,5 @@ class TestApplication(Application):
     def __init__(self, poetry: Poetry) -> None:
         super().__init__()
         self._poetry = poetry
+
+    __test__ = False
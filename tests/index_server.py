@@ -0,0 +1,242 @@
+import json
+import math
+import random
+import threading
+import time
+from collections.abc import Iterable
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from packaging.utils import canonicalize_name
+from poetry.core.version.pep440 import PEP440Version
+
+SIMPLE_JSON = "application/vnd.pypi.simple.v1+json"
+
+Failure = tuple[HTTPStatus, str | None]
+
+
+class IndexServer:
+    """Local package index serving the PyPI JSON and simple APIs
+
+    Packages are seeded from a manifest mapping package names to versions.
+    Responses can be delayed by `latency` seconds. Errors are injected from the
+    `failures` queue of (status, Retry-After) responses, sent before serving
+    anything else, and at random with `error_rate`. With `rate_limit`, at most
+    that many requests are served per `rate_window` seconds and the others are
+    answered with 429 and Retry-After.
+
+    Every package has a serial bumped on each release, sent as the
+    `X-PyPI-Last-Serial` header and used as ETag of JSON API responses.
+    """
+
+    def __init__(
+        self,
+        manifest: dict[str, str | Iterable[str]],
+        latency: float = 0,
+        failures: list[Failure] | None = None,
+        error_rate: float = 0,
+        rate_limit: int | None = None,
+        rate_window: float = 1,
+        seed: int = 0,
+    ) -> None:
+        self.packages: dict[str, list[str]] = {}
+        self.serials: dict[str, int] = {}
+        for name, versions in manifest.items():
+            self.release(name, *([versions] if isinstance(versions, str) else versions))
+
+        self.latency = latency
+        self.failures = failures or []
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.requests: list[tuple[str, dict[str, str]]] = []
+
+        self._random = random.Random(seed)  # noqa: S311
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+
+    @classmethod
+    def from_manifest(cls, path: Path, **options: Any) -> "IndexServer":
+        """Returns a server seeded from a JSON manifest file"""
+
+        return cls(json.loads(path.read_text()), **options)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def json_url(self) -> str:
+        return f"{self.url}/pypi"
+
+    @property
+    def simple_url(self) -> str:
+        return f"{self.url}/simple"
+
+    def release(self, name: str, *versions: str) -> None:
+        """Publishes new versions of a package, bumping its serial"""
+
+        name = canonicalize_name(name)
+        self.packages.setdefault(name, []).extend(versions)
+        self.serials[name] = max(self.serials.values(), default=0) + 1
+
+    def latest(self, name: str) -> str:
+        """Returns the latest stable version of a package, like PyPI"""
+
+        versions = sorted(self.packages[name], key=PEP440Version.parse)
+        stable = [
+            version
+            for version in versions
+            if not PEP440Version.parse(version).is_unstable()
+        ]
+
+        return (stable or versions)[-1]
+
+    def __enter__(self) -> "IndexServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _failure(self) -> Failure | None:
+        with self._lock:
+            if self.failures:
+                return self.failures.pop(0)
+
+            if self.rate_limit is not None:
+                now = time.monotonic()
+                if now - self._window_start >= self.rate_window:
+                    self._window_start = now
+                    self._window_requests = 0
+
+                self._window_requests += 1
+                if self._window_requests > self.rate_limit:
+                    remaining = self.rate_window - (now - self._window_start)
+                    return HTTPStatus.TOO_MANY_REQUESTS, str(math.ceil(remaining))
+
+            if self.error_rate and self._random.random() < self.error_rate:
+                return HTTPStatus.SERVICE_UNAVAILABLE, None
+
+        return None
+
+    def _json_page(self, name: str) -> dict[str, Any]:
+        return {
+            "info": {"name": name, "version": self.latest(name)},
+            "releases": {
+                version: [self._file(name, version)] for version in self.packages[name]
+            },
+        }
+
+    def _simple_page(self, name: str) -> dict[str, Any]:
+        return {
+            "meta": {"api-version": "1.1"},
+            "name": name,
+            "versions": self.packages[name],
+            "files": [self._file(name, version) for version in self.packages[name]],
+        }
+
+    def _file(self, name: str, version: str) -> dict[str, Any]:
+        filename = f"{name.replace('-', '_')}-{version}.tar.gz"
+
+        return {
+            "filename": filename,
+            "url": f"{self.url}/files/{filename}",
+            "hashes": {},
+            "yanked": False,
+        }
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                server.requests.append((self.path, dict(self.headers)))
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                failure = server._failure()  # noqa: SLF001
+                if failure is not None:
+                    status, retry_after = failure
+                    self.send_response(status)
+                    if retry_after is not None:
+                        self.send_header("Retry-After", retry_after)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                api, _, path = self.path.strip("/").partition("/")
+                name = canonicalize_name(path.split("/")[0]) if path else ""
+
+                if api not in ("pypi", "simple") or name not in server.packages:
+                    self.send_response(HTTPStatus.NOT_FOUND)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                serial = str(server.serials[name])
+                etag = f'"{name}-{serial}"'
+
+                if api == "pypi" and self.headers.get("If-None-Match") == etag:
+                    self.send_response(HTTPStatus.NOT_MODIFIED)
+                    self.send_header("X-PyPI-Last-Serial", serial)
+                    self.end_headers()
+                    return
+
+                if api == "pypi":
+                    self.send_body(
+                        json.dumps(server._json_page(name)),  # noqa: SLF001
+                        "application/json",
+                        serial,
+                        etag,
+                    )
+                elif SIMPLE_JSON in self.headers.get("Accept", ""):
+                    self.send_body(
+                        json.dumps(server._simple_page(name)),  # noqa: SLF001
+                        SIMPLE_JSON,
+                        serial,
+                    )
+                else:
+                    page = server._simple_page(name)  # noqa: SLF001
+                    links = "".join(
+                        f'<a href="{file["url"]}">{file["filename"]}</a>\n'
+                        for file in page["files"]
+                    )
+                    self.send_body(
+                        f"<!DOCTYPE html>\n<html><body>\n{links}</body></html>",
+                        "text/html",
+                        serial,
+                    )
+
+            def send_body(
+                self,
+                body: str,
+                content_type: str,
+                serial: str,
+                etag: str | None = None,
+            ) -> None:
+                content = body.encode()
+                self.send_response(HTTPStatus.OK)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.send_header("X-PyPI-Last-Serial", serial)
+                if etag is not None:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *_: Any) -> None:
+                pass
+
+        return Handler
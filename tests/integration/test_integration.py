@@ -51,7 +51,8 @@ def test_handle_dependency(
     )
     bump_version_in_pyproject_content.assert_called_once_with(
         dependency=dependency,
-        new_version=f"^{new_version}",
+        # the precision of "^1.0" is preserved
+        new_version="^2.0",
         pyproject_content=content,
     )
 
@@ -147,7 +148,8 @@ def test_handle_dependency_with_latest(
     )
     bump_version_in_pyproject_content.assert_called_once_with(
         dependency=dependency,
-        new_version=f"^{new_version}",
+        # the precision of "^1.0" is preserved
+        new_version="^2.0",
         pyproject_content=content,
     )
 
@@ -17,6 +17,9 @@ from tests.helpers import TestUpgradeCommand
         # Edge cases
         ("<0.0.1", "1.0.0", "<0.0.1", "happy_path_less_equal"),
         ("<=0.0.1", "1.0.0", "<=0.0.1", "happy_path_less_equal"),
+        ("^1.2", "1.5.3", "^1.5", "precision_preserved"),
+        ("~=1.2", "1.5.3", "~=1.5", "compatible_release"),
+        (">=1.2,<2.0", "2.3.1", ">=2.3,<3.0", "range_upper_bound_raised"),
     ],
 )
 def test_handle_version(
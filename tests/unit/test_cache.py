@@ -0,0 +1,184 @@
+import os
+from pathlib import Path
+
+from poetry.core.packages.package import Package
+from poetry.repositories import RepositoryPool
+from pytest_mock import MockerFixture
+
+from poetry_plugin_upgrade.cache import MetadataCache
+from poetry_plugin_upgrade.command import UpgradeCommand
+from poetry_plugin_upgrade.resolver import CachedVersionSelector
+from tests.index_server import IndexServer
+
+
+def test_cache_stores_entries_per_index(tmp_path: Path) -> None:
+    cache = MetadataCache(path=tmp_path)
+
+    cache.put("foo", "https://pypi.org/pypi", "1.0.0", etag='"abc"')
+    cache.put("foo", "https://example.com/simple", "2.0.0")
+
+    entry = cache.get("foo", "https://pypi.org/pypi")
+    assert entry is not None
+    assert entry.value == "1.0.0"
+    assert entry.etag == '"abc"'
+    assert entry.is_fresh(ttl=60)
+    assert not entry.is_fresh(ttl=0)
+    assert cache.get("foo", "https://example.com/simple").value == "2.0.0"
+    assert cache.get("bar", "https://pypi.org/pypi") is None
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path: Path) -> None:
+    cache = MetadataCache(path=tmp_path)
+    for age, name in enumerate(("foo", "bar", "baz")):
+        cache.put(name, "index", "1.0.0")
+        path = cache._entry_path(name, "index")  # noqa: SLF001
+        os.utime(path, (1000 + age, 1000 + age))
+
+    # reading `foo` makes `bar` the least recently used entry
+    cache.get("foo", "index")
+    cache.max_size = sum(
+        cache._entry_path(name, "index").stat().st_size  # noqa: SLF001
+        for name in ("foo", "baz")
+    )
+    cache.evict()
+
+    assert cache.get("foo", "index") is not None
+    assert cache.get("bar", "index") is None
+    assert cache.get("baz", "index") is not None
+
+
+def test_cache_only_scans_when_it_may_be_full(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    cache = MetadataCache(path=tmp_path)
+    evict = mocker.spy(cache, "evict")
+
+    for name in ("foo", "bar", "baz"):
+        cache.put(name, "index", "1.0.0")
+
+    # the first write scans the directory, later writes track the size
+    assert evict.call_count == 1
+
+    cache.max_size = 1
+    cache.put("qux", "index", "1.0.0")
+
+    assert evict.call_count == 2
+    assert list(tmp_path.glob("*.json")) == []
+
+
+def test_retrieve_latest_version_revalidates_stale_entries(tmp_path: Path) -> None:
+    cache = MetadataCache(path=tmp_path, ttl=0)
+
+    with IndexServer({"foo": "1.2.3"}) as index:
+        first = UpgradeCommand.retrieve_latest_version(
+            "foo", cache=cache, index_url=index.json_url
+        )
+        second = UpgradeCommand.retrieve_latest_version(
+            "foo", cache=cache, index_url=index.json_url
+        )
+
+    assert first == second == "1.2.3"
+    assert len(index.requests) == 2
+    assert "If-None-Match" not in index.requests[0][1]
+    assert index.requests[1][1]["If-None-Match"] == '"foo-1"'
+
+
+def test_retrieve_latest_version_serves_fresh_entries(tmp_path: Path) -> None:
+    cache = MetadataCache(path=tmp_path)
+
+    with IndexServer({"foo": "1.2.3"}) as index:
+        UpgradeCommand.retrieve_latest_version(
+            "foo", cache=cache, index_url=index.json_url
+        )
+        index.release("foo", "2.0.0")
+        cached = UpgradeCommand.retrieve_latest_version(
+            "foo", cache=cache, index_url=index.json_url
+        )
+        refreshed = UpgradeCommand.retrieve_latest_version(
+            "foo", cache=cache, refresh=True, index_url=index.json_url
+        )
+        missing = UpgradeCommand.retrieve_latest_version(
+            "bar", cache=cache, index_url=index.json_url
+        )
+
+    assert cached == "1.2.3"
+    assert refreshed == "2.0.0"
+    assert missing is None
+    assert len(index.requests) == 3
+
+
+def test_retrieve_latest_version_offline(tmp_path: Path) -> None:
+    cache = MetadataCache(path=tmp_path, ttl=0)
+    cache.put("foo", "http://127.0.0.1:9/pypi", "1.2.3")
+
+    assert (
+        UpgradeCommand.retrieve_latest_version(
+            "foo", cache=cache, offline=True, index_url="http://127.0.0.1:9/pypi"
+        )
+        == "1.2.3"
+    )
+    assert (
+        UpgradeCommand.retrieve_latest_version(
+            "bar", cache=cache, offline=True, index_url="http://127.0.0.1:9/pypi"
+        )
+        is None
+    )
+
+
+def test_cached_version_selector(tmp_path: Path, mocker: MockerFixture) -> None:
+    find_best_candidate = mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        return_value=Package(name="foo", version="1.5.0"),
+    )
+    cache = MetadataCache(path=tmp_path)
+    selector = CachedVersionSelector(pool=RepositoryPool(), cache=cache)
+
+    for _ in range(2):
+        candidate = selector.find_best_candidate(
+            package_name="foo", target_package_version="^1.0"
+        )
+        assert candidate is not None
+        assert candidate.pretty_version == "1.5.0"
+
+    find_best_candidate.assert_called_once()
+
+    offline = CachedVersionSelector(pool=RepositoryPool(), cache=cache, offline=True)
+    assert offline.find_best_candidate(package_name="bar") is None
+    find_best_candidate.assert_called_once()
+
+
+def test_cached_version_selector_reports_cache_hits(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        return_value=Package(name="foo", version="1.5.0"),
+    )
+    selector = CachedVersionSelector(
+        pool=RepositoryPool(), cache=MetadataCache(path=tmp_path)
+    )
+
+    _, first = selector.find_cached_candidate(package_name="foo")
+    candidate, second = selector.find_cached_candidate(package_name="foo")
+
+    assert candidate is not None
+    assert candidate.pretty_version == "1.5.0"
+    assert not first
+    assert second
+
+
+def test_cached_version_selector_refresh(tmp_path: Path, mocker: MockerFixture) -> None:
+    find_best_candidate = mocker.patch(
+        "poetry.version.version_selector.VersionSelector.find_best_candidate",
+        return_value=None,
+    )
+    cache = MetadataCache(path=tmp_path)
+    selector = CachedVersionSelector(pool=RepositoryPool(), cache=cache, refresh=True)
+    cache.put("foo * allow-prereleases=None", selector.index_url(None), "1.0.0")
+
+    assert selector.find_best_candidate(package_name="foo") is None
+    find_best_candidate.assert_called_once()
+    assert (
+        cache.get("foo * allow-prereleases=None", selector.index_url(None)).value
+        is None
+    )
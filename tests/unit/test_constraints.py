@@ -0,0 +1,106 @@
+import pytest
+
+from poetry_plugin_upgrade.constraints import (
+    ConstraintKind,
+    bump_constraint,
+    classify_constraint,
+    is_bumpable_range,
+)
+
+
+@pytest.mark.parametrize(
+    ("constraint", "expected"),
+    [
+        ("1.1.1", ConstraintKind.PINNED),
+        ("==1.1.1", ConstraintKind.PINNED),
+        ("===1.1.1", ConstraintKind.PINNED),
+        ("*", ConstraintKind.WILDCARD),
+        ("^1.1", ConstraintKind.CARET),
+        ("~1.1", ConstraintKind.TILDE),
+        ("~=1.1", ConstraintKind.COMPATIBLE),
+        ("<1.1", ConstraintKind.LESS_THAN),
+        ("<=1.1", ConstraintKind.LESS_THAN_OR_EQUAL),
+        (">1.1", ConstraintKind.GREATER_THAN),
+        (">=1.1", ConstraintKind.GREATER_THAN_OR_EQUAL),
+        ("!=1.1", ConstraintKind.NOT_EQUAL),
+        ("  >= 1.1 ", ConstraintKind.GREATER_THAN_OR_EQUAL),
+        ("== 1.1", ConstraintKind.PINNED),
+        (
+            ">=1.2,<2.0",
+            ConstraintKind.GREATER_THAN_OR_EQUAL
+            | ConstraintKind.LESS_THAN
+            | ConstraintKind.MULTIPLE,
+        ),
+        (
+            ">=1.2 <2.0",
+            ConstraintKind.GREATER_THAN_OR_EQUAL
+            | ConstraintKind.LESS_THAN
+            | ConstraintKind.MULTIPLE,
+        ),
+        (
+            "^1.0 || ^2.0",
+            ConstraintKind.CARET | ConstraintKind.MULTIPLE | ConstraintKind.UNION,
+        ),
+        ("", ConstraintKind.NONE),
+    ],
+)
+def test_classify_constraint(constraint: str, expected: ConstraintKind) -> None:
+    assert classify_constraint(constraint) == expected
+
+
+def test_classify_constraint_is_memoized() -> None:
+    classify_constraint.cache_clear()
+
+    classify_constraint("^1.2.3")
+    classify_constraint("^1.2.3")
+
+    assert classify_constraint.cache_info().hits == 1
+
+
+@pytest.mark.parametrize(
+    ("constraint", "candidate", "expected"),
+    [
+        ("^1.2", "1.5.3", "^1.5"),
+        ("^1.2.3", "1.5", "^1.5"),
+        ("^0", "0.1", "^0.1"),
+        ("^0.0.1", "0.0.3", "^0.0.3"),
+        ("~1", "2.2.2", "~2"),
+        ("~=1.2", "1.5.3", "~=1.5"),
+        (">=1.2", "1.5.3", ">=1.5"),
+        ("1.2", "1.5.3", "1.5.3"),
+        ("==1.2", "1.5.3", "==1.5.3"),
+        ("===1.2", "1.5.3", "===1.5.3"),
+        ("1.2.*", "2.3.4", "2.3.*"),
+        ("*", "2.0", "2.0"),
+        ("<1.0", "2.0", "<1.0"),
+        ("^1.2", "2.0.0rc1", "^2.0.0rc1"),
+        (">=1.2,<2.0", "1.5.0", ">=1.5,<2.0"),
+        (">=1.2, <2.0", "2.3.1", ">=2.3, <3.0"),
+        (">=1.2 <1.5", "1.7.2", ">=1.7 <1.8"),
+        (">=1.0,<=1.1,!=1.0.5", "2.0", ">=2.0,<=2.0,!=1.0.5"),
+        # exclusions of the candidate are dropped with their separator
+        (">=1.2,!=1.5", "1.5", ">=1.5"),
+        (">=1.2, !=1.5, <2.0", "1.5", ">=1.5, <2.0"),
+        ("!=1.5,>=1.2", "1.5", ">=1.5"),
+        (">=1.2,!=1.5.*", "1.5.3", ">=1.5"),
+        ("^1.0 || ^2.0", "2.5.0", "^1.0 || ^2.5"),
+        ("^1.0 || ^2.0", "3.1", "^1.0 || ^3.1"),
+    ],
+)
+def test_bump_constraint(constraint: str, candidate: str, expected: str) -> None:
+    assert bump_constraint(constraint, candidate) == expected
+
+
+@pytest.mark.parametrize(
+    ("constraint", "expected"),
+    [
+        (">=1.2,<2.0", True),
+        ("^1.2,!=1.5", True),
+        ("<2.0,!=1.5", False),
+        (">1.2,<2.0", False),
+        ("^1.0 || ^2.0", False),
+        ("^1.2", False),
+    ],
+)
+def test_is_bumpable_range(constraint: str, expected: bool) -> None:
+    assert is_bumpable_range(classify_constraint(constraint)) is expected
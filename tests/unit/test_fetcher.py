@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+from poetry_plugin_upgrade.command import UpgradeCommand
+from poetry_plugin_upgrade.fetcher import gather_latest_versions
+from tests.index_server import IndexServer
+
+
+def test_retrieve_latest_versions() -> None:
+    with IndexServer({"foo": "1.0.0", "bar": "2.0.0"}) as index:
+        result = asyncio.run(
+            UpgradeCommand.retrieve_latest_versions(
+                ["foo", "bar", "baz", "foo"], index_url=index.json_url
+            )
+        )
+
+    assert result.versions == {"foo": "1.0.0", "bar": "2.0.0", "baz": None}
+    assert result.errors == {}
+    assert len(index.requests) == 3
+
+
+def test_gather_latest_versions_reports_errors_separately() -> None:
+    def fetch(name: str) -> str | None:
+        if name == "bar":
+            raise ConnectionError(name)
+        return "1.0.0"
+
+    result = asyncio.run(
+        gather_latest_versions(["foo", "bar"], fetch=fetch, host=lambda _: "pypi")
+    )
+
+    assert result.versions == {"foo": "1.0.0"}
+    assert isinstance(result.errors["bar"], ConnectionError)
+
+
+def test_gather_latest_versions_limits_concurrency_per_host() -> None:
+    in_flight = {"pypi": 0, "private": 0}
+    peak = {"pypi": 0, "private": 0}
+    lock = threading.Lock()
+
+    def host(name: str) -> str:
+        return "private" if name.startswith("internal-") else "pypi"
+
+    def fetch(name: str) -> str | None:
+        with lock:
+            in_flight[host(name)] += 1
+            peak[host(name)] = max(peak[host(name)], in_flight[host(name)])
+        time.sleep(0.02)
+        with lock:
+            in_flight[host(name)] -= 1
+        return "1.0.0"
+
+    names = [f"package-{i}" for i in range(8)] + [f"internal-{i}" for i in range(4)]
+    result = asyncio.run(
+        gather_latest_versions(names, fetch=fetch, host=host, max_per_host=2)
+    )
+
+    assert len(result.versions) == 12
+    assert peak == {"pypi": 2, "private": 2}
+
+
+def test_gather_latest_versions_deadline() -> None:
+    timeouts: dict[str, float] = {}
+
+    def fetch(name: str, timeout: float) -> str | None:
+        timeouts[name] = timeout
+        time.sleep(2 if name == "slow" else 0)
+        return "1.0.0"
+
+    start = time.monotonic()
+    result = asyncio.run(
+        gather_latest_versions(
+            ["fast", "slow"], fetch=fetch, host=lambda _: "pypi", deadline=0.1
+        )
+    )
+
+    # the call returns at the deadline, without waiting for the slow lookup
+    assert time.monotonic() - start < 0.5
+    assert result.versions == {"fast": "1.0.0"}
+    assert isinstance(result.errors["slow"], TimeoutError)
+    assert all(0 < timeout <= 0.1 for timeout in timeouts.values())
+
+
+def test_gather_latest_versions_sizes_pool_for_every_host() -> None:
+    # every lookup waits for all the others, more than the default executor runs
+    barrier = threading.Barrier(60, timeout=5)
+
+    def fetch(_: str) -> str | None:
+        barrier.wait()
+        return "1.0.0"
+
+    names = [f"{host}-{i}" for host in ("a", "b", "c") for i in range(20)]
+    result = asyncio.run(
+        gather_latest_versions(
+            names, fetch=fetch, host=lambda name: name[0], max_per_host=20
+        )
+    )
+
+    assert result.errors == {}
+    assert len(result.versions) == 60
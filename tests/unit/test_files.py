@@ -0,0 +1,41 @@
+from pathlib import Path
+
+from poetry_plugin_upgrade.files import ProjectSnapshot, atomic_write, write_document
+
+
+def test_atomic_write(tmp_path: Path) -> None:
+    path = tmp_path / "pyproject.toml"
+    path.write_text("old")
+
+    atomic_write(path, b"new")
+
+    assert path.read_bytes() == b"new"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_project_snapshot_restore(tmp_path: Path) -> None:
+    pyproject_path = tmp_path / "pyproject.toml"
+    lock_path = tmp_path / "poetry.lock"
+    pyproject_path.write_bytes(b"[tool.poetry]\r\n")
+
+    snapshot = ProjectSnapshot([pyproject_path, lock_path])
+    pyproject_path.write_text("changed")
+    lock_path.write_text("created")
+    snapshot.restore()
+
+    assert pyproject_path.read_bytes() == b"[tool.poetry]\r\n"
+    assert not lock_path.exists()
+
+
+def test_project_snapshot_document(tmp_path: Path) -> None:
+    path = tmp_path / "pyproject.toml"
+    path.write_bytes(b'[tool.poetry.dependencies]\r\nfoo = "^1.0"\r\n')
+
+    snapshot = ProjectSnapshot([path])
+    path.write_text("changed")
+    document = snapshot.document(path)
+    document["tool"]["poetry"]["dependencies"]["foo"] = "^2.0"
+    write_document(path, document)
+
+    # the document is parsed from the snapshot, line endings are kept
+    assert path.read_bytes() == b'[tool.poetry.dependencies]\r\nfoo = "^2.0"\r\n'
@@ -0,0 +1,140 @@
+from pathlib import Path
+
+from poetry.repositories import RepositoryPool
+from poetry.repositories.legacy_repository import LegacyRepository
+from poetry.repositories.pypi_repository import PyPiRepository
+from poetry.utils.authenticator import Authenticator
+from poetry.utils.password_manager import HTTPAuthCredential
+
+from poetry_plugin_upgrade.cache import MetadataCache
+from poetry_plugin_upgrade.incremental import (
+    IncrementalVersionSelector,
+    LookupState,
+    UpgradeState,
+    probe,
+    probe_url,
+)
+from poetry_plugin_upgrade.resolver import CandidateLookup, resolve_lookup
+from tests.index_server import IndexServer
+
+LOOKUPS = [
+    CandidateLookup(
+        package_name=name,
+        target_package_version="*",
+        allow_prereleases=False,
+        source=None,
+    )
+    for name in ("foo", "bar")
+]
+
+
+def test_probe_url() -> None:
+    pypi = PyPiRepository(url="https://pypi.org/", disable_cache=True)
+    legacy = LegacyRepository("local", "https://example.com/simple/")
+
+    assert probe_url([pypi], "foo") == "https://pypi.org/pypi/foo/json"
+    assert probe_url([legacy], "foo") == "https://example.com/simple/foo/"
+    assert probe_url([pypi, legacy], "foo") is None
+
+
+def test_probe(index_server: IndexServer) -> None:
+    url = f"{index_server.json_url}/foo/json"
+    session = Authenticator(disable_cache=True)
+
+    first = probe(session, url, None)
+    state = LookupState(
+        index_url=index_server.url,
+        candidate="2.2.2",
+        serial=first.serial,
+        etag=first.etag,
+    )
+    unchanged = probe(session, url, state)
+    index_server.release("foo", "3.0.0")
+    changed = probe(session, url, state)
+
+    assert first.changed
+    assert not unchanged.changed
+    assert unchanged.serial == first.serial
+    assert changed.changed
+    assert changed.serial != first.serial
+
+
+def test_probe_compares_serials_without_etag(index_server: IndexServer) -> None:
+    url = f"{index_server.simple_url}/foo/"
+    session = Authenticator(disable_cache=True)
+    serial = probe(session, url, None).serial
+    state = LookupState(index_url=index_server.url, candidate="2.2.2", serial=serial)
+
+    assert not probe(session, url, state).changed
+    assert probe(session, "http://127.0.0.1:1/foo/", state).changed
+
+
+def test_probe_sends_repository_credentials(index_server: IndexServer) -> None:
+    repository = LegacyRepository("local", index_server.simple_url, disable_cache=True)
+    repository.session.get_credentials_for_url = (  # type: ignore[method-assign]
+        lambda _: HTTPAuthCredential(username="user", password="secret")
+    )
+
+    probe(repository.session, f"{index_server.simple_url}/foo/", None)
+
+    [(_, headers)] = index_server.requests
+    assert headers["Authorization"].startswith("Basic ")
+
+
+def create_selector(
+    index_server: IndexServer, cache_path: Path, state: UpgradeState
+) -> IncrementalVersionSelector:
+    repository = PyPiRepository(url=f"{index_server.url}/", disable_cache=True)
+
+    return IncrementalVersionSelector(
+        pool=RepositoryPool([repository]),
+        cache=MetadataCache(cache_path),
+        state=state,
+    )
+
+
+def test_incremental_selector_only_resolves_changed_packages(
+    index_server: IndexServer, tmp_path: Path
+) -> None:
+    path = tmp_path / "state.json"
+
+    state = UpgradeState(path)
+    first = [
+        resolve_lookup(
+            create_selector(index_server, tmp_path / "cache", state), lookup, None
+        )
+        for lookup in LOOKUPS
+    ]
+    state.save()
+
+    index_server.release("foo", "3.0.0")
+    index_server.requests.clear()
+
+    state = UpgradeState(path)
+    second = [
+        resolve_lookup(
+            create_selector(index_server, tmp_path / "cache", state), lookup, None
+        )
+        for lookup in LOOKUPS
+    ]
+    state.save()
+
+    assert [resolution.cached for resolution in first] == [False, False]
+    assert [resolution.candidate.pretty_version for resolution in second] == [
+        "3.0.0",
+        "2.2.2",
+    ]
+    # foo changed and is resolved again, bar is served from the state
+    assert [resolution.cached for resolution in second] == [False, True]
+    assert not any(path.startswith("/simple/bar") for path, _ in index_server.requests)
+    assert UpgradeState(path).previous["foo * allow-prereleases=False"].candidate == (
+        "3.0.0"
+    )
+
+
+def test_upgrade_state_ignores_invalid_files(tmp_path: Path) -> None:
+    path = tmp_path / "state.json"
+    path.write_text("{")
+
+    assert UpgradeState(path).previous == {}
+    assert UpgradeState(tmp_path / "missing.json").previous == {}
@@ -0,0 +1,106 @@
+import time
+from http import HTTPStatus
+
+import requests
+from poetry.repositories import RepositoryPool
+from poetry.repositories.legacy_repository import LegacyRepository
+from poetry.version.version_selector import VersionSelector
+
+from tests.index_server import SIMPLE_JSON, IndexServer
+
+
+def test_json_api(index_server: IndexServer) -> None:
+    response = requests.get(f"{index_server.json_url}/baz/json", timeout=5)
+
+    assert response.status_code == HTTPStatus.OK
+    # pre-releases are never the latest version, like on PyPI
+    assert response.json()["info"]["version"] == "2.2.2"
+    assert set(response.json()["releases"]) == {"1.1.1", "2.2.2", "3.0.0a1"}
+    assert response.headers["X-PyPI-Last-Serial"] == "3"
+
+    missing = requests.get(f"{index_server.json_url}/missing/json", timeout=5)
+    assert missing.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_json_api_revalidation(index_server: IndexServer) -> None:
+    url = f"{index_server.json_url}/foo/json"
+    etag = requests.get(url, timeout=5).headers["ETag"]
+
+    cached = requests.get(url, headers={"If-None-Match": etag}, timeout=5)
+    index_server.release("foo", "3.0.0")
+    released = requests.get(url, headers={"If-None-Match": etag}, timeout=5)
+
+    assert cached.status_code == HTTPStatus.NOT_MODIFIED
+    assert released.status_code == HTTPStatus.OK
+    assert released.json()["info"]["version"] == "3.0.0"
+
+
+def test_simple_api(index_server: IndexServer) -> None:
+    html = requests.get(f"{index_server.simple_url}/foo/", timeout=5)
+    page = requests.get(
+        f"{index_server.simple_url}/foo/", headers={"Accept": SIMPLE_JSON}, timeout=5
+    )
+
+    assert html.headers["Content-Type"] == "text/html"
+    assert "foo-2.2.2.tar.gz" in html.text
+    assert page.headers["Content-Type"] == SIMPLE_JSON
+    assert page.json()["versions"] == ["1.1.1", "2.2.2"]
+
+
+def test_version_selector_against_simple_api(index_server: IndexServer) -> None:
+    repository = LegacyRepository("local", index_server.simple_url, disable_cache=True)
+    selector = VersionSelector(RepositoryPool([repository]))
+
+    candidate = selector.find_best_candidate("foo", "^1.0")
+
+    assert candidate is not None
+    assert candidate.pretty_version == "1.1.1"
+
+
+def test_failures_are_injected_in_order() -> None:
+    failures = [(HTTPStatus.SERVICE_UNAVAILABLE, "1")]
+
+    with IndexServer({"foo": "1.0.0"}, failures=failures) as index:
+        first = requests.get(f"{index.json_url}/foo/json", timeout=5)
+        second = requests.get(f"{index.json_url}/foo/json", timeout=5)
+
+    assert first.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert first.headers["Retry-After"] == "1"
+    assert second.status_code == HTTPStatus.OK
+
+
+def test_error_rate_is_deterministic() -> None:
+    def statuses() -> list[int]:
+        with IndexServer({"foo": "1.0.0"}, error_rate=0.5, seed=1) as index:
+            return [
+                requests.get(f"{index.json_url}/foo/json", timeout=5).status_code
+                for _ in range(10)
+            ]
+
+    first = statuses()
+
+    assert first == statuses()
+    assert HTTPStatus.SERVICE_UNAVAILABLE in first
+    assert HTTPStatus.OK in first
+
+
+def test_rate_limit() -> None:
+    with IndexServer({"foo": "1.0.0"}, rate_limit=2, rate_window=60) as index:
+        responses = [
+            requests.get(f"{index.json_url}/foo/json", timeout=5) for _ in range(3)
+        ]
+
+    assert [response.status_code for response in responses] == [
+        HTTPStatus.OK,
+        HTTPStatus.OK,
+        HTTPStatus.TOO_MANY_REQUESTS,
+    ]
+    assert responses[2].headers["Retry-After"] == "60"
+
+
+def test_latency() -> None:
+    with IndexServer({"foo": "1.0.0"}, latency=0.1) as index:
+        start = time.perf_counter()
+        requests.get(f"{index.json_url}/foo/json", timeout=5)
+
+    assert time.perf_counter() - start >= 0.1
@@ -0,0 +1,123 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pytest
+from poetry.repositories import RepositoryPool
+from poetry.repositories.legacy_repository import LegacyRepository
+
+from poetry_plugin_upgrade.limits import (
+    SourceLimit,
+    SourceLimiter,
+    TokenBucket,
+    apply_limits,
+    load_limits,
+)
+from tests.index_server import IndexServer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def test_token_bucket() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+
+    # the burst is served at once, then one request every 0.5 s
+    assert [bucket.acquire() for _ in range(4)] == [0, 0, 0.5, 0.5]
+
+    clock.now += 10
+    # idle time refills the bucket up to its capacity only
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0.5]
+
+
+def test_source_limiter_bounds_requests_in_flight() -> None:
+    limiter = SourceLimiter(SourceLimit(max_in_flight=2))
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def request(_: int) -> None:
+        nonlocal in_flight, peak
+        with limiter.slot():
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight -= 1
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(request, range(16)))
+
+    assert peak == 2
+
+
+def test_load_limits() -> None:
+    content = {
+        "tool": {
+            "poetry-plugin-upgrade": {
+                "sources": {
+                    "PyPI": {"pool-size": 32, "max-in-flight": 32},
+                    "private": {"max-in-flight": 2, "rate-limit": 0.5, "burst": 4},
+                }
+            }
+        }
+    }
+
+    assert load_limits(content) == {
+        "pypi": SourceLimit(pool_size=32, max_in_flight=32),
+        "private": SourceLimit(max_in_flight=2, rate_limit=0.5, burst=4),
+    }
+    assert load_limits({}) == {}
+
+
+@pytest.mark.parametrize(
+    ("settings", "error"),
+    [
+        ({"max_in_flight": 2}, "unknown setting 'max_in_flight' of source 'private'"),
+        ({"pool-size": 0}, "'pool-size' of source 'private' must be a positive"),
+        ({"burst": 1.5}, "'burst' of source 'private' must be a positive integer"),
+        ({"rate-limit": "1/s"}, "'rate-limit' of source 'private' must be a"),
+        ({"max-in-flight": True}, "'max-in-flight' of source 'private' must be"),
+    ],
+)
+def test_load_limits_invalid(settings: dict[str, Any], error: str) -> None:
+    content = {"tool": {"poetry-plugin-upgrade": {"sources": {"private": settings}}}}
+
+    with pytest.raises(ValueError, match=error):
+        load_limits(content)
+
+
+def test_apply_limits(index_server: IndexServer) -> None:
+    index_server.latency = 0.05
+    local = LegacyRepository("local", index_server.simple_url, disable_cache=True)
+    mirror = LegacyRepository("mirror", index_server.simple_url, disable_cache=True)
+    pool = RepositoryPool([local, mirror])
+
+    limiters = apply_limits(pool, {"local": SourceLimit(pool_size=4, max_in_flight=1)})
+
+    assert list(limiters) == ["local"]
+    session = local.session.get_session(local.url)
+    assert session.get_adapter(local.url).poolmanager.connection_pool_kw == {
+        "maxsize": 4,
+        "block": False,
+    }
+
+    # unlimited repositories keep their own request method
+    assert "request" not in vars(mirror.session)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(local.get_page, ["foo", "bar", "baz", "corge"]))
+
+    # requests to the limited source are sent one at a time
+    assert time.perf_counter() - start >= 4 * index_server.latency
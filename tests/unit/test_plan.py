@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+from cleo.io.buffered_io import BufferedIO
+
+from poetry_plugin_upgrade.plan import PlanRecord, PlanWriter, UpgradePlan
+
+RECORDS = [
+    PlanRecord(
+        group="main",
+        name="foo",
+        old_constraint="^1.0",
+        new_constraint="^2.0",
+        candidate="2.0",
+    ),
+    PlanRecord(group="dev", name="bar", old_constraint="<1.0", skip_reason="less than"),
+]
+
+
+def test_plan_writer_ndjson() -> None:
+    io = BufferedIO()
+    writer = PlanWriter(io, "ndjson")
+
+    for record in RECORDS:
+        writer.write(record)
+    writer.close()
+
+    lines = io.fetch_output().splitlines()
+    assert [PlanRecord(**json.loads(line)) for line in lines] == RECORDS
+
+
+def test_plan_writer_json() -> None:
+    io = BufferedIO()
+    writer = PlanWriter(io, "json")
+
+    for record in RECORDS:
+        writer.write(record)
+    writer.close()
+
+    records = json.loads(io.fetch_output())
+    assert [PlanRecord(**record) for record in records] == RECORDS
+
+
+def test_plan_writer_json_without_records() -> None:
+    io = BufferedIO()
+    writer = PlanWriter(io, "json")
+
+    writer.close()
+
+    assert json.loads(io.fetch_output()) == []
+
+
+def test_upgrade_plan_round_trip(tmp_path: Path) -> None:
+    path = tmp_path / "plan.json"
+
+    UpgradePlan(latest=True, records=RECORDS).dump(path)
+
+    assert UpgradePlan.load(path) == UpgradePlan(latest=True, records=RECORDS)
+
+
+def test_upgrade_plan_candidates() -> None:
+    plan = UpgradePlan(
+        latest=False,
+        records=[
+            *RECORDS,
+            PlanRecord(
+                group="main,Docs", name="Foo_Bar", old_constraint="^1", candidate="1.2"
+            ),
+        ],
+    )
+
+    assert plan.candidates() == {
+        ("main", "foo"): "2.0",
+        ("main", "foo-bar"): "1.2",
+        ("docs", "foo-bar"): "1.2",
+    }
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        {"version": 2, "latest": False, "records": []},
+        {"version": 1, "records": []},
+        {"version": 1, "latest": False, "records": [{"name": "foo"}]},
+    ],
+)
+def test_upgrade_plan_load_rejects_invalid_plans(
+    tmp_path: Path, content: dict[str, Any]
+) -> None:
+    path = tmp_path / "plan.json"
+    path.write_text(json.dumps(content))
+
+    with pytest.raises(ValueError):  # noqa: PT011
+        UpgradePlan.load(path)
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+
+from poetry_plugin_upgrade.command import UpgradeCommand
+from poetry_plugin_upgrade.plugin import factory
+
+# modules Poetry has already imported when it loads application plugins
+POETRY_STARTUP = "import poetry.console.application, poetry.plugins.application_plugin"
+# microseconds the plugin may add to every Poetry invocation
+IMPORT_BUDGET = 5000
+
+
+def run_python(code: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"{POETRY_STARTUP}; {code}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_factory_creates_command() -> None:
+    assert isinstance(factory(), UpgradeCommand)
+
+
+def test_plugin_does_not_import_command() -> None:
+    process = run_python(
+        "import sys, poetry_plugin_upgrade.plugin; "
+        "print(sorted(name for name in sys.modules "
+        "if name.startswith(('poetry_plugin_upgrade.', 'requests'))))"
+    )
+
+    assert process.stdout.strip() == "['poetry_plugin_upgrade.plugin']"
+
+
+def test_plugin_import_time_is_within_budget() -> None:
+    cumulative = []
+
+    # the best of a few runs, to ignore noisy neighbours
+    for _ in range(3):
+        process = run_python("import poetry_plugin_upgrade.plugin")
+        for line in process.stderr.splitlines():
+            _, _, timing = line.partition("import time:")
+            columns = [column.strip() for column in timing.split("|")]
+            if columns[-1] == "poetry_plugin_upgrade.plugin":
+                cumulative.append(int(columns[1]))
+
+    assert min(cumulative) < IMPORT_BUDGET
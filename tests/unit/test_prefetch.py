@@ -0,0 +1,75 @@
+from pathlib import Path
+
+from poetry.repositories import RepositoryPool
+from poetry.repositories.legacy_repository import LegacyRepository
+
+from poetry_plugin_upgrade.cache import MetadataCache
+from poetry_plugin_upgrade.prefetch import group_by_source, prefetch_pages
+from poetry_plugin_upgrade.resolver import (
+    CachedVersionSelector,
+    CandidateLookup,
+    find_candidate,
+)
+from poetry_plugin_upgrade.timings import Timings
+from tests.index_server import IndexServer
+
+
+def lookup(name: str, source: str | None = None) -> CandidateLookup:
+    return CandidateLookup(
+        package_name=name,
+        target_package_version="*",
+        allow_prereleases=False,
+        source=source,
+    )
+
+
+def create_selector(index_server: IndexServer, tmp_path: Path) -> CachedVersionSelector:
+    pool = RepositoryPool(
+        [
+            LegacyRepository("local", index_server.simple_url, disable_cache=True),
+            LegacyRepository("mirror", index_server.simple_url, disable_cache=True),
+        ]
+    )
+
+    return CachedVersionSelector(pool=pool, cache=MetadataCache(tmp_path))
+
+
+def test_group_by_source(index_server: IndexServer, tmp_path: Path) -> None:
+    selector = create_selector(index_server, tmp_path)
+    # served from the metadata cache, no page is needed
+    find_candidate(selector, lookup("baz", "mirror"))
+
+    sources = group_by_source(
+        selector,
+        [
+            lookup("foo"),
+            lookup("Bar", "mirror"),
+            lookup("foo"),
+            lookup("baz", "mirror"),
+        ],
+    )
+
+    assert {source.repository.name: list(source.names) for source in sources} == {
+        "local": ["foo"],
+        "mirror": ["foo", "bar"],
+    }
+
+
+def test_prefetch_pages(index_server: IndexServer, tmp_path: Path) -> None:
+    selector = create_selector(index_server, tmp_path)
+    lookups = [lookup("foo", "local"), lookup("bar", "local"), lookup("missing")]
+    sources = group_by_source(selector, lookups)
+    timings = Timings()
+
+    prefetch_pages(sources, jobs=4, timings=timings)
+    requests = len(index_server.requests)
+    candidates = [find_candidate(selector, lookup) for lookup in lookups[:2]]
+
+    assert [candidate.pretty_version for candidate in candidates] == ["2.2.2"] * 2
+    # selection runs on the prefetched pages
+    assert len(index_server.requests) == requests
+    assert {source.repository.name: source.failed for source in sources} == {
+        "local": ["missing"],
+        "mirror": ["missing"],
+    }
+    assert [phase.calls for phase in timings.summary()] == [4]
@@ -0,0 +1,36 @@
+import re
+
+from cleo.io.buffered_io import BufferedIO
+
+from poetry_plugin_upgrade.progress import Progress
+
+
+def test_progress_prints_one_line_per_event() -> None:
+    io = BufferedIO()
+    progress = Progress(io, total=3)
+
+    progress.advance(["foo: ^1.0 -> ^2.0", "foo: ^1.0 -> ^2.0"])
+    progress.advance(["bar: failed"], failed=True)
+    progress.finish()
+
+    assert io.fetch_error().splitlines() == [
+        "[1/3] foo: ^1.0 -> ^2.0",
+        "[1/3] foo: ^1.0 -> ^2.0",
+        "[2/3] bar: failed",
+    ]
+    assert (progress.done, progress.pending, progress.failed) == (1, 1, 1)
+
+
+def test_progress_redraws_status_line_on_terminals() -> None:
+    io = BufferedIO(decorated=True)
+    progress = Progress(io, total=2)
+
+    progress.advance(["foo: ^1.0 -> ^2.0"])
+    progress.advance(["bar: ^1.0 -> ^2.0"])
+    progress.finish()
+
+    output = re.sub(r"\x1b\[[0-9;]*[A-Za-z]", "", io.fetch_error())
+    assert "foo: ^1.0 -> ^2.0" in output
+    assert "bar: ^1.0 -> ^2.0" in output
+    assert output.count("Resolving dependencies:") == 3
+    assert output.endswith("Resolving dependencies: 2 done, 0 pending, 0 failed\n")
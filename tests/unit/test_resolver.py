@@ -0,0 +1,251 @@
+import time
+from unittest.mock import Mock
+
+import pytest
+from poetry.core.packages.package import Package
+
+from poetry_plugin_upgrade.resolver import (
+    CandidateLookup,
+    LookupPlan,
+    Resolution,
+    resolve_candidates,
+)
+
+
+def test_resolve_candidates_preserves_lookup_order() -> None:
+    delays = {"foo": 0.05, "bar": 0.0, "baz": 0.02}
+
+    def find_best_candidate(package_name: str, **_: object) -> Package:
+        time.sleep(delays[package_name])
+        return Package(name=package_name, version="2.0.0")
+
+    selector = Mock()
+    selector.find_best_candidate = Mock(side_effect=find_best_candidate)
+    lookups = [
+        CandidateLookup(
+            package_name=name,
+            target_package_version="^1.0",
+            allow_prereleases=False,
+            source=None,
+        )
+        for name in delays
+    ]
+
+    candidates = resolve_candidates(selector=selector, lookups=lookups, jobs=3)
+
+    assert [candidate.name for candidate in candidates] == ["foo", "bar", "baz"]
+    assert selector.find_best_candidate.call_count == 3
+
+
+def test_resolve_candidates_with_single_job() -> None:
+    selector = Mock()
+    selector.find_best_candidate = Mock(return_value=None)
+    lookup = CandidateLookup(
+        package_name="foo",
+        target_package_version="*",
+        allow_prereleases=True,
+        source="private",
+    )
+
+    assert resolve_candidates(selector=selector, lookups=[lookup], jobs=1) == [None]
+    selector.find_best_candidate.assert_called_once_with(
+        package_name="foo",
+        target_package_version="*",
+        allow_prereleases=True,
+        source="private",
+    )
+
+
+def test_lookup_plan_deduplicates_lookups() -> None:
+    pytest_lookup = CandidateLookup(
+        package_name="pytest",
+        target_package_version="^8.0",
+        allow_prereleases=False,
+        source=None,
+    )
+    requests_lookup = CandidateLookup(
+        package_name="requests",
+        target_package_version="^2.31",
+        allow_prereleases=False,
+        source=None,
+    )
+    candidate = Package(name="pytest", version="8.3.3")
+    selector = Mock()
+    selector.find_best_candidate = Mock(side_effect=[candidate, None])
+
+    plan = LookupPlan([pytest_lookup, requests_lookup, pytest_lookup])
+    candidates = plan.resolve(selector=selector, jobs=1)
+
+    assert plan.lookups == [pytest_lookup, requests_lookup]
+    assert plan.saved == 1
+    assert candidates == {pytest_lookup: candidate, requests_lookup: None}
+    assert selector.find_best_candidate.call_count == 2
+
+
+def test_lookup_plan_keeps_lookups_with_different_sources() -> None:
+    lookups = [
+        CandidateLookup(
+            package_name="foo",
+            target_package_version="*",
+            allow_prereleases=False,
+            source=source,
+        )
+        for source in (None, "private")
+    ]
+
+    plan = LookupPlan(lookups)
+
+    assert plan.lookups == lookups
+    assert plan.saved == 0
+
+
+def test_resolve_candidates_streams_resolutions() -> None:
+    def find_best_candidate(package_name: str, **_: object) -> Package:
+        return Package(name=package_name, version="2.0.0")
+
+    selector = Mock()
+    selector.find_best_candidate = Mock(side_effect=find_best_candidate)
+    lookups = [
+        CandidateLookup(
+            package_name=name,
+            target_package_version="^1.0",
+            allow_prereleases=False,
+            source=None,
+        )
+        for name in ("foo", "bar")
+    ]
+    resolutions: list[Resolution] = []
+
+    resolve_candidates(
+        selector=selector, lookups=lookups, jobs=2, on_resolved=resolutions.append
+    )
+
+    assert {resolution.lookup for resolution in resolutions} == set(lookups)
+    assert all(resolution.cached is None for resolution in resolutions)
+    assert all(resolution.seconds >= 0 for resolution in resolutions)
+
+
+def test_resolve_candidates_reports_and_raises_errors() -> None:
+    selector = Mock()
+    selector.find_best_candidate = Mock(side_effect=ConnectionError("offline"))
+    lookup = CandidateLookup(
+        package_name="foo",
+        target_package_version="*",
+        allow_prereleases=False,
+        source=None,
+    )
+    resolutions: list[Resolution] = []
+
+    with pytest.raises(ConnectionError):
+        resolve_candidates(
+            selector=selector,
+            lookups=[lookup],
+            on_resolved=resolutions.append,
+        )
+
+    [resolution] = resolutions
+    assert resolution.candidate is None
+    assert isinstance(resolution.error, ConnectionError)
+
+
+def test_resolve_candidates_skips_errors() -> None:
+    def find_best_candidate(package_name: str, **_: object) -> Package:
+        if package_name == "bar":
+            raise ConnectionError("timed out")
+        return Package(name=package_name, version="2.0.0")
+
+    selector = Mock()
+    selector.find_best_candidate = Mock(side_effect=find_best_candidate)
+    lookups = [
+        CandidateLookup(
+            package_name=name,
+            target_package_version="*",
+            allow_prereleases=False,
+            source=None,
+        )
+        for name in ("foo", "bar", "baz")
+    ]
+    resolutions: list[Resolution] = []
+
+    candidates = resolve_candidates(
+        selector=selector,
+        lookups=lookups,
+        jobs=3,
+        on_resolved=resolutions.append,
+        on_error="skip",
+    )
+
+    assert [candidate and candidate.name for candidate in candidates] == [
+        "foo",
+        None,
+        "baz",
+    ]
+    assert [
+        resolution.lookup.package_name
+        for resolution in resolutions
+        if resolution.error is not None
+    ] == ["bar"]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_resolve_candidates_retries_errors(jobs: int) -> None:
+    failures = {"foo": 2, "bar": 0}
+
+    def find_best_candidate(package_name: str, **_: object) -> Package:
+        if failures[package_name]:
+            failures[package_name] -= 1
+            raise ConnectionError("timed out")
+        return Package(name=package_name, version="2.0.0")
+
+    selector = Mock()
+    selector.find_best_candidate = Mock(side_effect=find_best_candidate)
+    lookups = [
+        CandidateLookup(
+            package_name=name,
+            target_package_version="*",
+            allow_prereleases=False,
+            source=None,
+        )
+        for name in failures
+    ]
+    resolutions: list[Resolution] = []
+
+    candidates = resolve_candidates(
+        selector=selector,
+        lookups=lookups,
+        jobs=jobs,
+        on_resolved=resolutions.append,
+        on_error="retry",
+        retries=2,
+        backoff=0,
+    )
+
+    assert [candidate.name for candidate in candidates] == ["foo", "bar"]
+    # only final outcomes are reported
+    assert {
+        resolution.lookup.package_name: resolution.attempts
+        for resolution in resolutions
+    } == {"foo": 3, "bar": 1}
+    assert selector.find_best_candidate.call_count == 4
+
+
+def test_resolve_candidates_raises_errors_once_retries_are_exhausted() -> None:
+    selector = Mock()
+    selector.find_best_candidate = Mock(side_effect=ConnectionError("offline"))
+    lookup = CandidateLookup(
+        package_name="foo",
+        target_package_version="*",
+        allow_prereleases=False,
+        source=None,
+    )
+
+    with pytest.raises(ConnectionError):
+        resolve_candidates(
+            selector=selector,
+            lookups=[lookup],
+            on_error="retry",
+            retries=2,
+            backoff=0,
+        )
+
+    assert selector.find_best_candidate.call_count == 3
@@ -0,0 +1,143 @@
+import pytest
+from poetry.core.packages.dependency import Dependency
+from tomlkit import parse
+
+from poetry_plugin_upgrade.sections import SectionIndex, bump_pep_508
+
+
+@pytest.mark.parametrize(
+    ("requirement", "new_version", "expected"),
+    [
+        ("requests>=2.0", ">=2.5", "requests>=2.5"),
+        ("requests >= 2.0", ">=2.5", "requests >=2.5"),
+        ("Requests[security] (>=2.0)", ">=2.5", "Requests[security] (>=2.5)"),
+        (
+            'requests>=2.0 ; python_version >= "3.8"',
+            ">=2.5",
+            'requests>=2.5 ; python_version >= "3.8"',
+        ),
+        ("requests==2.0", "2.5", "requests==2.5"),
+        ("requests~=2.0", "^2.5", "requests>=2.5,<3.0"),
+        ("requests", "2.5", None),
+        ("requests @ https://example.com/requests.whl", "2.5", None),
+    ],
+)
+def test_bump_pep_508(requirement: str, new_version: str, expected: str) -> None:
+    assert bump_pep_508(requirement, new_version) == expected
+
+
+def test_section_index_bumps_pep_621_and_poetry_sections() -> None:
+    content = parse(
+        """
+        [project]
+        dependencies = [
+            "requests>=2.0",  # http client
+            "foo (>=1.0) ; python_version >= '3.8'",
+        ]
+
+        [project.optional-dependencies]
+        docs = ["Sphinx>=7.0"]
+
+        [tool.poetry.dependencies]
+        requests = { source = "private" }
+
+        [tool.poetry.group.dev.dependencies]
+        Py_Test = "^7.0"
+        """
+    )
+    bumps = [
+        (Dependency(name="requests", constraint=">=2.0", groups=["main"]), ">=2.5"),
+        (Dependency(name="sphinx", constraint=">=7.0", groups=["main"]), ">=8.1"),
+        (Dependency(name="py-test", constraint="^7.0", groups=["dev"]), "^8.3"),
+        (Dependency(name="missing", constraint="^1.0", groups=["main"]), "^2.0"),
+    ]
+
+    bumped = SectionIndex(content).apply(bumps)
+
+    assert bumped == ["requests", "sphinx", "py-test"]
+    assert content["project"]["dependencies"][0] == "requests>=2.5"
+    assert content["project"]["dependencies"][1] == (
+        "foo (>=1.0) ; python_version >= '3.8'"
+    )
+    assert content["project"]["optional-dependencies"]["docs"] == ["Sphinx>=8.1"]
+    assert content["tool"]["poetry"]["dependencies"]["requests"] == {
+        "source": "private"
+    }
+    assert content["tool"]["poetry"]["group"]["dev"]["dependencies"]["Py_Test"] == (
+        "^8.3"
+    )
+    assert '"requests>=2.5",  # http client' in content.as_string()
+
+
+def test_section_index_bumps_each_requirement_of_a_package() -> None:
+    content = parse(
+        """
+        [project]
+        dependencies = [
+            "numpy>=1.20; python_version<'3.10'",
+            "numpy>=2.0; python_version>='3.10'",
+            "requests>=2.0",
+        ]
+
+        [project.optional-dependencies]
+        http = ["requests>=2.0"]
+        """
+    )
+    dependencies = [
+        Dependency.create_from_pep_508(requirement)
+        for requirement in content["project"]["dependencies"]
+    ]
+    extra = Dependency.create_from_pep_508('requests>=2.0 ; extra == "http"')
+
+    bumped = SectionIndex(content).apply(
+        [
+            (dependencies[0], ">=1.26"),
+            (dependencies[1], ">=2.2"),
+            (dependencies[2], ">=2.5"),
+            (extra, ">=2.4"),
+        ]
+    )
+
+    assert bumped == ["numpy", "requests"]
+    assert content["project"]["dependencies"] == [
+        "numpy>=1.26; python_version<'3.10'",
+        "numpy>=2.2; python_version>='3.10'",
+        "requests>=2.5",
+    ]
+    assert content["project"]["optional-dependencies"]["http"] == ["requests>=2.4"]
+
+
+def test_section_index_skips_ambiguous_requirements() -> None:
+    content = parse(
+        """
+        [project]
+        dependencies = ["numpy>=1.20; os_name=='nt'", "numpy>=1.20; os_name=='nt'"]
+        """
+    )
+    dependency = Dependency.create_from_pep_508("numpy>=1.20; os_name=='nt'")
+
+    assert SectionIndex(content).apply([(dependency, ">=2.2")]) == []
+    assert content["project"]["dependencies"] == [
+        "numpy>=1.20; os_name=='nt'",
+        "numpy>=1.20; os_name=='nt'",
+    ]
+
+
+def test_section_index_declared_constraint() -> None:
+    content = parse(
+        """
+        [project]
+        dependencies = ["sphinx~=5.0", "attrs", "requests (>=2.0)"]
+
+        [tool.poetry.dependencies]
+        requests = ">=2.1"
+        """
+    )
+    index = SectionIndex(content)
+    sphinx = Dependency.create_from_pep_508("sphinx~=5.0")
+    attrs = Dependency.create_from_pep_508("attrs")
+
+    assert index.declared_constraint(sphinx) == "~=5.0"
+    assert index.declared_constraint(attrs) == ""
+    # versions declared in Poetry tables take precedence
+    assert index.declared_constraint(Dependency("requests", ">=2.1")) is None
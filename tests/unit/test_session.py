@@ -0,0 +1,64 @@
+import time
+from http import HTTPStatus
+
+import pytest
+import requests
+from poetry.repositories import RepositoryPool
+from poetry.repositories.legacy_repository import LegacyRepository
+
+from poetry_plugin_upgrade.command import UpgradeCommand
+from poetry_plugin_upgrade.session import create_session, resize_pools
+from tests.index_server import IndexServer
+
+
+def test_create_session_pool_size() -> None:
+    session = create_session(pool_size=24)
+    adapter = session.get_adapter("https://pypi.org")
+
+    assert adapter._pool_maxsize == 24  # noqa: SLF001
+    assert adapter.max_retries.total == 3
+
+
+def test_resize_pools() -> None:
+    repository = LegacyRepository("local", "https://example.com/simple/")
+
+    resize_pools(RepositoryPool([repository]), pool_size=24)
+
+    session = repository.session.get_session(repository.url)
+    adapter = session.get_adapter(repository.url)
+    assert adapter.poolmanager.connection_pool_kw["maxsize"] == 24
+
+
+def test_session_retries_throttled_and_failed_requests() -> None:
+    failures = [
+        (HTTPStatus.TOO_MANY_REQUESTS, "1"),
+        (HTTPStatus.SERVICE_UNAVAILABLE, None),
+    ]
+    session = create_session(retries=2, backoff_factor=0)
+
+    with IndexServer({"foo": "1.2.3"}, failures=failures) as index:
+        start = time.monotonic()
+        version = UpgradeCommand.retrieve_latest_version(
+            "foo", session=session, index_url=index.json_url
+        )
+        elapsed = time.monotonic() - start
+
+    assert version == "1.2.3"
+    assert len(index.requests) == 3
+    # the Retry-After header of the 429 response is honoured
+    assert elapsed >= 1
+
+
+def test_session_raises_once_retries_are_exhausted() -> None:
+    failures = [(HTTPStatus.BAD_GATEWAY, None)] * 2
+    session = create_session(retries=1, backoff_factor=0)
+
+    with (
+        IndexServer({"foo": "1.2.3"}, failures=failures) as index,
+        pytest.raises(requests.HTTPError),
+    ):
+        UpgradeCommand.retrieve_latest_version(
+            "foo", session=session, index_url=index.json_url
+        )
+
+    assert len(index.requests) == 2
@@ -0,0 +1,61 @@
+import json
+from pathlib import Path
+
+from poetry_plugin_upgrade.timings import Timings
+
+
+def test_span_records_duration_and_attributes() -> None:
+    timings = Timings()
+
+    with timings.span("find_best_candidate", package="foo"):
+        pass
+
+    [span] = timings.spans
+    assert span.name == "find_best_candidate"
+    assert span.attributes == {"package": "foo"}
+    assert span.start >= 0
+    assert span.duration >= 0
+
+
+def test_span_is_recorded_on_error() -> None:
+    timings = Timings()
+
+    try:
+        with timings.span("update"):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+
+    assert [span.name for span in timings.spans] == ["update"]
+
+
+def test_summary_aggregates_phases_in_order() -> None:
+    timings = Timings()
+
+    with timings.span("read"):
+        pass
+    for package in ("foo", "bar"):
+        with timings.span("find_best_candidate", package=package):
+            pass
+
+    summary = timings.summary()
+
+    assert [(phase.name, phase.calls) for phase in summary] == [
+        ("read", 1),
+        ("find_best_candidate", 2),
+    ]
+    assert summary[1].max <= summary[1].total
+
+
+def test_dump(tmp_path: Path) -> None:
+    timings = Timings()
+    path = tmp_path / "timings.json"
+
+    with timings.span("write"):
+        pass
+
+    timings.dump(path)
+
+    content = json.loads(path.read_text())
+    assert [span["name"] for span in content["spans"]] == ["write"]
+    assert content["phases"][0]["calls"] == 1
@@ -1,7 +1,12 @@
+import pytest
 from poetry.core.packages.dependency import Dependency
 from tomlkit import parse
 
-from src.poetry_plugin_upgrade.command import is_pinned
+from src.poetry_plugin_upgrade.command import (
+    ExcludeMatcher,
+    is_bumping_prevented,
+    is_pinned,
+)
 from tests.helpers import TestUpgradeCommand
 
 
@@ -301,7 +306,7 @@ def test_is_bumpable_is_false_when_version_multiple_requirements(
 ) -> None:
     dependency = Dependency(
         name="foo",
-        constraint=">=1.2.3, <2.0.0",
+        constraint="<2.0.0, !=1.5.0",
     )
     is_bumpable = upgrade_cmd_tester.is_bumpable(
         dependency=dependency,
@@ -554,3 +559,141 @@ def test_is_bumpable_is_false_when_preserve_wildcard(
         preserve_wildcard=False,
     )
     assert is_bumpable is False
+
+
+def test_bump_version_in_pyproject_content_returns_if_bumped(
+    upgrade_cmd_tester: TestUpgradeCommand,
+) -> None:
+    content = parse(
+        """
+        [tool.poetry.dependencies]
+        python = "^3.7"
+        foo = "^1.0"
+        """
+    )
+
+    assert upgrade_cmd_tester.bump_version_in_pyproject_content(
+        dependency=Dependency(name="foo", constraint="^1.0", groups=["main"]),
+        new_version="^1.9",
+        pyproject_content=content,
+    )
+    assert not upgrade_cmd_tester.bump_version_in_pyproject_content(
+        dependency=Dependency(name="bar", constraint="^1.0", groups=["main"]),
+        new_version="^1.9",
+        pyproject_content=content,
+    )
+
+
+def test_exclude_matcher() -> None:
+    exclude = ExcludeMatcher(["Foo_Bar", "types-*", "re:^mypy(-.*)?$"])
+
+    assert "python" in exclude
+    assert "foo-bar" in exclude
+    assert "FOO.BAR" in exclude
+    assert "types-requests" in exclude
+    assert "types_toml" in exclude
+    assert "mypy" in exclude
+    assert "mypy-extensions" in exclude
+    assert "foo" not in exclude
+    assert "typesetter" not in exclude
+    assert "pymypy" not in exclude
+
+
+def test_exclude_matcher_with_flags_and_declared_names() -> None:
+    exclude = ExcludeMatcher(["re:(?i)^types", "re:^mypy_"])
+
+    assert "Types-Requests" in exclude
+    assert "mypy_extensions" in exclude
+    assert "mypy-extensions" not in exclude
+    assert "foo" not in exclude
+
+
+def test_exclude_matcher_rejects_invalid_expressions() -> None:
+    with pytest.raises(ValueError, match="invalid pattern 're:\\('"):
+        ExcludeMatcher(["foo", "re:("])
+
+
+def test_is_bumping_prevented_does_not_grow_exclude() -> None:
+    exclude = ["foo"]
+
+    for _ in range(3):
+        assert is_bumping_prevented(Dependency(name="foo", constraint="^1.0"), exclude)
+        assert not is_bumping_prevented(
+            Dependency(name="bar", constraint="^1.0"), exclude
+        )
+
+    assert exclude == ["foo"]
+
+
+@pytest.mark.parametrize(
+    ("dependency", "latest", "pinned", "expected"),
+    [
+        (
+            Dependency(name="foo", constraint="*", source_type="git"),
+            True,
+            True,
+            "git source",
+        ),
+        (Dependency(name="python", constraint="^3.10"), True, True, "excluded"),
+        (Dependency(name="bar", constraint="^1.0"), False, False, "not selected"),
+        (Dependency(name="foo", constraint="1.0.0"), False, False, "pinned"),
+        (Dependency(name="foo", constraint="1.0.0"), True, False, "pinned"),
+        (Dependency(name="foo", constraint="*"), False, False, "wildcard"),
+        (Dependency(name="foo", constraint="<2.0"), False, False, "less than"),
+        (
+            Dependency(name="foo", constraint="<2.0,!=1.5"),
+            False,
+            False,
+            "multiple requirements",
+        ),
+        (Dependency(name="foo", constraint=">=1.0,<2.0"), False, False, None),
+        (Dependency(name="foo", constraint="^1.0"), False, False, None),
+        (Dependency(name="foo", constraint="1.0.0"), True, True, None),
+    ],
+)
+def test_skip_reason(
+    dependency: Dependency,
+    latest: bool,
+    pinned: bool,
+    expected: str | None,
+    upgrade_cmd_tester: TestUpgradeCommand,
+) -> None:
+    assert (
+        upgrade_cmd_tester.skip_reason(
+            dependency=dependency,
+            only_packages=["foo", "python"],
+            latest=latest,
+            pinned=pinned,
+            exclude=[],
+            preserve_wildcard=False,
+        )
+        == expected
+    )
+
+
+@pytest.mark.parametrize(
+    ("constraint", "expected"),
+    [
+        ("~=1.1", True),
+        (" ^1.1.1 ", True),
+        ("^1.0 || ^2.0", False),
+        ("< 1.1", False),
+        ("== 1.1", False),
+    ],
+)
+def test_is_bumpable_with_pep_440_constraints(
+    constraint: str, expected: bool, upgrade_cmd_tester: TestUpgradeCommand
+) -> None:
+    dependency = Dependency(name="foo", constraint=constraint)
+
+    assert (
+        upgrade_cmd_tester.is_bumpable(
+            dependency=dependency,
+            only_packages=[],
+            latest=False,
+            pinned=False,
+            exclude=[],
+            preserve_wildcard=False,
+        )
+        is expected
+    )
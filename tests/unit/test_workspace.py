@@ -0,0 +1,114 @@
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from poetry_plugin_upgrade.files import ProjectSnapshot
+from poetry_plugin_upgrade.workspace import (
+    WorkspaceProject,
+    discover_projects,
+    display_path,
+    run_update,
+    run_updates,
+    update_command,
+)
+
+
+def test_discover_projects(tmp_path: Path) -> None:
+    for name in ("b", "a"):
+        (tmp_path / "services" / name).mkdir(parents=True)
+        (tmp_path / "services" / name / "pyproject.toml").touch()
+    (tmp_path / "services" / "empty").mkdir()
+
+    assert discover_projects(
+        ["services/*", "services/a/pyproject.toml"], root=tmp_path
+    ) == [
+        tmp_path / "services" / "a" / "pyproject.toml",
+        tmp_path / "services" / "b" / "pyproject.toml",
+    ]
+
+
+def test_discover_projects_outside_of_root(tmp_path: Path) -> None:
+    (tmp_path / "root").mkdir()
+    (tmp_path / "svc-a").mkdir()
+    (tmp_path / "svc-a" / "pyproject.toml").touch()
+    root = tmp_path / "root"
+
+    assert discover_projects(["../svc-*"], root=root) == [
+        tmp_path / "svc-a" / "pyproject.toml"
+    ]
+    assert display_path(tmp_path / "svc-a" / "pyproject.toml", root) == (
+        str(Path("..", "svc-a", "pyproject.toml"))
+    )
+
+
+@pytest.mark.parametrize("pattern", ["", "/services/*"])
+def test_discover_projects_rejects_unsupported_patterns(
+    tmp_path: Path, pattern: str
+) -> None:
+    with pytest.raises(ValueError, match="unsupported pattern"):
+        discover_projects([pattern], root=tmp_path)
+
+
+def test_update_command() -> None:
+    assert update_command(["foo", "bar"], no_install=True) == [
+        sys.executable,
+        "-m",
+        "poetry",
+        "update",
+        "--no-interaction",
+        "--lock",
+        "foo",
+        "bar",
+    ]
+
+
+def test_run_updates(mocker: MockerFixture, tmp_path: Path) -> None:
+    run = mocker.patch(
+        "poetry_plugin_upgrade.workspace.subprocess.run",
+        side_effect=lambda args, **_: subprocess.CompletedProcess(
+            args=args, returncode=int("bar" in args), stdout=f"Updating {args[-1]}"
+        ),
+    )
+    projects = []
+    for name, bumped in (("a", ["foo"]), ("b", ["bar"])):
+        poetry = MagicMock()
+        poetry.file.path = tmp_path / name / "pyproject.toml"
+        projects.append(
+            WorkspaceProject(
+                poetry=poetry,
+                content=MagicMock(),
+                snapshot=ProjectSnapshot([]),
+                bumped=bumped,
+            )
+        )
+
+    results = run_updates(projects, no_install=False, jobs=2)
+
+    assert [result.project for result in results] == projects
+    assert [result.failed for result in results] == [False, True]
+    assert [result.output for result in results] == ["Updating foo", "Updating bar"]
+    assert sorted(call.kwargs["cwd"] for call in run.call_args_list) == [
+        tmp_path / "a",
+        tmp_path / "b",
+    ]
+
+
+def test_run_update_reports_errors(mocker: MockerFixture, tmp_path: Path) -> None:
+    mocker.patch(
+        "poetry_plugin_upgrade.workspace.subprocess.run",
+        side_effect=FileNotFoundError("No such file or directory"),
+    )
+    poetry = MagicMock()
+    poetry.file.path = tmp_path / "pyproject.toml"
+    project = WorkspaceProject(
+        poetry=poetry, content=MagicMock(), snapshot=ProjectSnapshot([])
+    )
+
+    result = run_update(project, no_install=True)
+
+    assert result.failed
+    assert result.output == "No such file or directory"